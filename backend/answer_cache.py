@@ -0,0 +1,83 @@
+"""
+Cache of /ask answers keyed on (kundli_cache_key, normalized question).
+
+Many users ask near-identical questions ("Will I get married this year?",
+"will i get married this year") about the same chart. Those pairs are
+answered once by the model and then served from memory, so a repeat costs no
+model call. ANSWER_CACHE_CHARGE decides whether a cached answer still costs
+the user a credit ('full', the default) or is free ('free').
+"""
+
+import os
+import re
+import unicodedata
+
+from kundli_cache import TTLCache
+
+CHARGE_POLICIES = {'full': 1, 'free': 0}
+
+_NON_WORD = re.compile(r'[^\w\s]+')
+_SPACES = re.compile(r'\s+')
+
+# Only words that never change what is asked. Question words, modals,
+# pronouns and prepositions stay in the key: "who will I marry" and "will I
+# marry", "should I" and "can I", "my career" and "her career", "move from X
+# to Y" and "move to X from Y" are different questions
+STOP_WORDS = frozenset("a an the please kindly".split())
+
+
+def normalize_question(question, drop_stop_words=False):
+    """Case-folded words without punctuation: 'Will I get married, this year?' -> 'will i get married this year'"""
+    text = unicodedata.normalize('NFKC', question or '').casefold()
+    words = _SPACES.split(_NON_WORD.sub(' ', text).strip())
+    if drop_stop_words:
+        kept = [w for w in words if w not in STOP_WORDS]
+        # A question made only of stop words keeps them rather than matching everything
+        words = kept or words
+    return ' '.join(w for w in words if w)
+
+
+class AnswerCache:
+    def __init__(self, max_entries=10000, ttl=86400, drop_stop_words=False, charge_policy='full'):
+        if charge_policy not in CHARGE_POLICIES:
+            raise ValueError(f"Unknown ANSWER_CACHE_CHARGE policy: {charge_policy}; use one of {sorted(CHARGE_POLICIES)}")
+        self._cache = TTLCache(max_entries=max_entries, ttl=ttl)
+        self.drop_stop_words = drop_stop_words
+        self.charge_policy = charge_policy
+        self.charge = CHARGE_POLICIES[charge_policy]
+        self.tokens_saved = 0
+
+    def key(self, kundli_cache_key, question):
+        return f"{kundli_cache_key or '-'}|{normalize_question(question, self.drop_stop_words)}"
+
+    def get(self, kundli_cache_key, question):
+        """Cached answer for this chart and question, or None"""
+        entry = self._cache.get(self.key(kundli_cache_key, question))
+        if entry is None:
+            return None
+        answer, tokens = entry
+        self.tokens_saved += tokens
+        return answer
+
+    def set(self, kundli_cache_key, question, answer, tokens=0):
+        """Store a model answer with the tokens it cost to produce"""
+        self._cache.set(self.key(kundli_cache_key, question), (answer, tokens))
+
+    def stats(self):
+        stats = self._cache.stats()
+        stats["tokens_saved"] = self.tokens_saved
+        stats["charge_policy"] = self.charge_policy
+        return stats
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token) for streamed answers without usage data"""
+    return max(1, len(text) // 4)
+
+
+answer_cache = AnswerCache(
+    max_entries=int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', 10000)),
+    ttl=int(os.getenv('ANSWER_CACHE_TTL', 86400)),
+    drop_stop_words=os.getenv('ANSWER_CACHE_STOP_WORDS', 'False') == 'True',
+    charge_policy=os.getenv('ANSWER_CACHE_CHARGE', 'full').lower(),
+)
@@ -0,0 +1,71 @@
+"""
+Caches for the authentication path in main.py.
+
+Verified Firebase ID tokens are cached by token hash until shortly before the
+token's own `exp`, and user profiles are cached for a few seconds and dropped
+whenever the user's credits change. Google's public signing certificates are
+already cached by firebase_admin (its verifier honours the certificates'
+Cache-Control max-age), so a cache miss only costs the local signature check.
+"""
+
+import hashlib
+import os
+import time
+
+from fastapi.concurrency import run_in_threadpool
+from firebase_admin import auth
+
+from kundli_cache import TTLCache
+
+# Never trust a cached verification for longer than this, whatever `exp` says
+TOKEN_MAX_TTL = int(os.getenv('AUTH_TOKEN_CACHE_MAX_TTL', 3600))
+# Stop using a token this many seconds before it expires
+TOKEN_EXPIRY_SKEW = 30
+
+verified_tokens = TTLCache(
+    max_entries=int(os.getenv('AUTH_TOKEN_CACHE_MAX_ENTRIES', 10000)),
+    ttl=TOKEN_MAX_TTL,
+)
+user_profiles = TTLCache(
+    max_entries=int(os.getenv('USER_PROFILE_CACHE_MAX_ENTRIES', 10000)),
+    ttl=int(os.getenv('USER_PROFILE_CACHE_TTL', 30)),
+)
+
+
+def _token_key(id_token):
+    return hashlib.sha256(id_token.encode('utf-8')).hexdigest()
+
+
+async def verify_id_token(id_token):
+    """Verify a Firebase ID token, reusing earlier verifications of the same token"""
+    key = _token_key(id_token)
+    decoded_token = verified_tokens.get(key)
+    if decoded_token is not None:
+        return decoded_token
+
+    # The SDK call is blocking, keep it off the event loop
+    decoded_token = await run_in_threadpool(auth.verify_id_token, id_token)
+    ttl = min(decoded_token.get('exp', 0) - time.time() - TOKEN_EXPIRY_SKEW, TOKEN_MAX_TTL)
+    if ttl > 0:
+        verified_tokens.set(key, decoded_token, ttl=ttl)
+    return decoded_token
+
+
+def get_user_profile(uid):
+    return user_profiles.get(uid)
+
+
+def set_user_profile(uid, profile):
+    user_profiles.set(uid, profile)
+
+
+def invalidate_user(uid):
+    """Drop a cached profile, e.g. after its credits changed"""
+    user_profiles.pop(uid)
+
+
+def stats():
+    return {
+        "verified_tokens": verified_tokens.stats(),
+        "user_profiles": user_profiles.stats(),
+    }
@@ -0,0 +1,116 @@
+"""
+Bulk chart computation for backfills.
+
+Birth records are processed in chunks: every chunk's UTC offsets (one
+searchsorted per timezone), planet longitudes, speeds, ascendants, rasis and
+house placements are computed in a handful of vectorized NumPy passes over the
+whole chunk instead of once per person.
+"""
+
+import numpy as np
+
+from ephemeris import (
+    PLANETS, RASI_NAMES, NAKSHATRA_NAMES, NAKSHATRA_SPAN, sidereal_longitudes, daily_speeds, ascendant
+)
+import timezones
+from vargas import PLANET_SYMBOLS
+
+CHUNK_SIZE = 2000
+
+
+def _parse_record(record):
+    """Local birth time (seconds), latitude, longitude and timezone of one record"""
+    lat, lon = float(record['lat']), float(record['lon'])
+    zone = record.get('timezone') or timezones.timezone_for(lat, lon)
+    # Fails early for unknown zones, and builds the table outside the hot path
+    timezones.zone_table(zone)
+    return timezones.local_seconds(record['dob'], record['tob']), lat, lon, zone
+
+
+def _julian_days(local_ts, zones):
+    """UTC Julian days and offsets for local birth times, one lookup pass per zone"""
+    offsets = np.zeros(len(local_ts), dtype=np.int64)
+    names, inverse = np.unique(np.array(zones), return_inverse=True)
+    for k, zone in enumerate(names):
+        rows = inverse == k
+        offsets[rows] = timezones.zone_table(str(zone)).offsets_for_local(local_ts[rows])
+    return (local_ts - offsets) / 86400.0 + 2440587.5, offsets
+
+
+def compute_chunk(jd, lat, lon):
+    """
+    Vectorized chart core for arrays of Julian days and coordinates.
+
+    Returns (longitudes, speeds, asc, rasis, houses) where the planet arrays
+    have shape (9, N) in PLANETS order and asc has shape (N,).
+    """
+    longitudes = sidereal_longitudes(jd)
+    speeds = daily_speeds(jd)
+    asc = ascendant(jd, lat, lon)
+    asc_rasi = (asc // 30).astype(int)
+    rasis = (longitudes // 30).astype(int)
+    houses = (rasis - asc_rasi) % 12 + 1
+    return longitudes, speeds, asc, rasis, houses
+
+
+def compute_charts(records, chunk_size=CHUNK_SIZE):
+    """Yield one chart dict per birth record, in input order"""
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+
+        parsed = []
+        errors = {}
+        for i, record in enumerate(chunk):
+            try:
+                parsed.append(_parse_record(record))
+            except (KeyError, TypeError, ValueError) as e:
+                errors[i] = str(e)
+                parsed.append(None)
+
+        valid = [i for i in range(len(chunk)) if i not in errors]
+        if valid:
+            local_ts, lat, lon, zones = zip(*[parsed[i] for i in valid])
+            jd, offsets = _julian_days(np.array(local_ts, dtype=np.int64), zones)
+            lat, lon = np.array(lat, dtype=float), np.array(lon, dtype=float)
+            offsets = offsets.tolist()
+            longitudes, speeds, asc, rasis, houses = compute_chunk(jd, lat, lon)
+            # Plain Python scalars are much faster to serialize than NumPy ones
+            longitudes, speeds, asc = longitudes.round(6).tolist(), speeds.tolist(), asc.round(6).tolist()
+            rasis, houses = rasis.tolist(), houses.tolist()
+        column = {i: n for n, i in enumerate(valid)}
+
+        for i, record in enumerate(chunk):
+            if i in errors:
+                yield {"id": record.get('id') if isinstance(record, dict) else None, "error": errors[i]}
+                continue
+
+            n = column[i]
+            # Same entries as /kundli's planet_positions (process_real_kundli_data)
+            entries = [("Ascendant", asc[n], int(asc[n] // 30) % 12, 1, False)]
+            entries += [(name, longitudes[p][n], rasis[p][n], houses[p][n], name in ('Rahu', 'Ketu') or speeds[p][n] < 0)
+                        for p, name in enumerate(PLANETS)]
+            planet_positions = [{
+                "planet": name,
+                "symbol": PLANET_SYMBOLS[name],
+                "sign": RASI_NAMES[sign],
+                "degree": f"{longitude % 30:.2f}°",
+                "longitude": longitude,
+                "house": f"House {house}",
+                "nakshatra": NAKSHATRA_NAMES[int(longitude // NAKSHATRA_SPAN) % 27],
+                "retrograde": retrograde
+            } for name, longitude, sign, house, retrograde in entries]
+
+            yield {
+                "id": record.get('id'),
+                "sun_sign": planet_positions[1]['sign'],
+                "moon_sign": planet_positions[2]['sign'],
+                "rising_sign": planet_positions[0]['sign'],
+                "planet_positions": planet_positions,
+                "birth_details": {
+                    "date_of_birth": record['dob'],
+                    "time_of_birth": record['tob'],
+                    "place_of_birth": record.get('pob', ''),
+                    "timezone": zones[n],
+                    "utc_offset": timezones.format_offset(offsets[n])
+                }
+            }
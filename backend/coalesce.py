@@ -0,0 +1,44 @@
+"""
+Request coalescing for identical concurrent work.
+
+The first caller for a key runs the work; callers that arrive while it is in
+flight await the same task instead of repeating it.
+"""
+
+import asyncio
+
+
+class SingleFlight:
+    def __init__(self):
+        self._in_flight = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key, fn):
+        """Run fn() once per key at a time and share its result or exception"""
+        task = self._in_flight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.create_task(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.followers += 1
+        # shield() so a disconnecting client does not cancel the shared work
+        return await asyncio.shield(task)
+
+    def _done(self, key, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Retrieve the exception so a task whose callers all left does not warn
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        total = self.leaders + self.followers
+        return {
+            "in_flight": len(self._in_flight),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "coalesce_ratio": round(self.followers / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,158 @@
+"""
+Credit ledger for /ask.
+
+A question's credit is reserved atomically before the model is called, in a
+Firestore transaction that refuses to overdraw the balance, and then either
+committed or refunded with an atomic increment if the question fails.
+Concurrent questions can no longer overwrite each other's decrements the way
+a read-then-update of `credits - 1` did.
+
+The user's `last_question_at` is always written on `users/{uid}`.
+
+Users whose document has `credit_shards: N` keep their balance split across
+`users/{uid}/credit_shards/{0..N-1}`. A reservation takes from a random
+shard with enough credits, so concurrent questions from one account touch
+different documents instead of serializing on the user document. The user
+document's own `credits` still counts as one more shard: purchases
+(functions/src/handlers/payment.ts) keep adding to it, and it is drawn on
+once the shards run low. firestore.rules keeps clients from writing
+`credits` or `credit_shards`.
+"""
+
+import os
+import random
+from datetime import datetime
+
+from firebase_admin import firestore
+
+# Default shard count when an admin switches a user to the sharded layout
+CREDIT_SHARDS = int(os.getenv('CREDIT_SHARDS', 8))
+SHARD_COLLECTION = 'credit_shards'
+
+
+class InsufficientCredits(Exception):
+    pass
+
+
+class Reservation:
+    """Credits taken from one document, pending commit or refund"""
+
+    def __init__(self, uid, cost, ref=None, balance=None, sharded=False):
+        self.uid = uid
+        self.cost = cost
+        self.ref = ref
+        self.sharded = sharded
+        # Exact for the single-document layout, an estimate for sharded users
+        self.balance = balance
+        self.settled = cost == 0
+
+
+@firestore.async_transactional
+async def _take(transaction, ref, cost, fields=None):
+    """Decrement ref's credits by cost inside a transaction; returns the new balance or None"""
+    snapshot = await ref.get(transaction=transaction)
+    credits = (snapshot.to_dict() or {}).get('credits', 0) if snapshot.exists else 0
+    if credits < cost:
+        return None
+    transaction.update(ref, {'credits': credits - cost, **(fields or {})})
+    return credits - cost
+
+
+class CreditLedger:
+    def __init__(self, db):
+        self.db = db
+        self.reserved = 0
+        self.committed = 0
+        self.refunded = 0
+        self.rejected = 0
+
+    def _user(self, uid):
+        return self.db.collection('users').document(uid)
+
+    def _shards(self, uid):
+        return self._user(uid).collection(SHARD_COLLECTION)
+
+    async def balance(self, uid, user_data):
+        """Current credits of a user, adding the shards for sharded users"""
+        total = user_data.get('credits', 0)
+        if not user_data.get('credit_shards'):
+            return total
+        async for shard in self._shards(uid).stream():
+            total += (shard.to_dict() or {}).get('credits', 0)
+        return total
+
+    async def reserve(self, user, cost=1):
+        """Take `cost` credits from a UserResponse; raises InsufficientCredits"""
+        if cost <= 0:
+            return Reservation(user.uid, 0, balance=user.credits)
+
+        user_ref = self._user(user.uid)
+        if not getattr(user, 'credit_shards', 0):
+            remaining = await _take(self.db.transaction(), user_ref, cost, {'last_question_at': datetime.now()})
+            if remaining is not None:
+                self.reserved += 1
+                return Reservation(user.uid, cost, user_ref, remaining)
+        else:
+            shard_ids = list(range(user.credit_shards))
+            random.shuffle(shard_ids)
+            # Shards in random order, then the user document where purchases land
+            refs = [self._shards(user.uid).document(str(i)) for i in shard_ids] + [user_ref]
+            for ref in refs:
+                remaining = await _take(self.db.transaction(), ref, cost)
+                if remaining is not None:
+                    self.reserved += 1
+                    return Reservation(user.uid, cost, ref, max(user.credits - cost, 0), sharded=True)
+        self.rejected += 1
+        raise InsufficientCredits(f"{user.uid} has fewer than {cost} credits")
+
+    async def commit(self, reservation):
+        """Keep the reserved credits; the decrement is already written"""
+        if reservation.settled:
+            return
+        reservation.settled = True
+        self.committed += 1
+        if reservation.sharded:
+            # The single-document layout records this in the reservation itself
+            await self._user(reservation.uid).update({'last_question_at': datetime.now()})
+
+    async def refund(self, reservation):
+        """Give back the reserved credits if the reservation was not committed"""
+        if reservation.settled:
+            return
+        reservation.settled = True
+        await reservation.ref.update({'credits': firestore.Increment(reservation.cost)})
+        self.refunded += 1
+        print(f"[CREDITS] Refunded {reservation.cost} credit(s) to {reservation.uid}")
+
+    async def shard_user(self, uid, shards=CREDIT_SHARDS):
+        """
+        Move a user's balance into `shards` shard documents (a no-op if already
+        sharded); later purchases still land on, and are spent from, the user document
+        """
+        user_ref = self._user(uid)
+
+        @firestore.async_transactional
+        async def move(transaction):
+            snapshot = await user_ref.get(transaction=transaction)
+            user_data = snapshot.to_dict() or {}
+            if user_data.get('credit_shards'):
+                return user_data['credit_shards']
+            credits = user_data.get('credits', 0)
+            for i in range(shards):
+                # Spread the balance evenly, the remainder on the first shards
+                share = credits // shards + (1 if i < credits % shards else 0)
+                transaction.set(self._shards(uid).document(str(i)), {'credits': share})
+            transaction.update(user_ref, {'credits': 0, 'credit_shards': shards})
+            return shards
+
+        shards = await move(self.db.transaction())
+        print(f"[CREDITS] {uid} uses {shards} credit shards")
+        return shards
+
+    def stats(self):
+        return {
+            "reserved": self.reserved,
+            "committed": self.committed,
+            "refunded": self.refunded,
+            "rejected": self.rejected,
+        }
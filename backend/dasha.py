@@ -0,0 +1,143 @@
+"""
+Vimshottari dasha timelines.
+
+The 120-year cycle starts from the lord of the natal Moon's nakshatra, with the
+first mahadasha shortened by the part of the nakshatra the Moon has already
+crossed. Every period splits into nine sub-periods in the same lord order,
+starting from its own lord, in proportion to each lord's years.
+
+Periods are expanded lazily: a period computes its children the first time
+they are asked for and keeps them, and timelines are memoized per chart, so
+only the depth and date range actually requested is ever materialized.
+"""
+
+import os
+from datetime import timedelta
+
+from ephemeris import NAKSHATRA_SPAN
+from kundli_cache import TTLCache
+
+DASHA_ORDER = ['Ketu', 'Venus', 'Sun', 'Moon', 'Mars', 'Rahu', 'Jupiter', 'Saturn', 'Mercury']
+DASHA_YEARS = {
+    'Ketu': 7, 'Venus': 20, 'Sun': 6, 'Moon': 10, 'Mars': 7,
+    'Rahu': 18, 'Jupiter': 16, 'Saturn': 19, 'Mercury': 17
+}
+CYCLE_YEARS = 120
+YEAR_DAYS = 365.25
+LEVELS = ['mahadasha', 'antardasha', 'pratyantardasha', 'sookshma', 'prana']
+
+
+class DashaPeriod:
+    """One period of the tree; children are built on first access"""
+
+    __slots__ = ('lord', 'start', 'end', 'level', '_children')
+
+    def __init__(self, lord, start, end, level):
+        self.lord = lord
+        self.start = start
+        self.end = end
+        self.level = level
+        self._children = None
+
+    @property
+    def children(self):
+        if self._children is None:
+            if self.level + 1 >= len(LEVELS):
+                self._children = []
+            else:
+                self._children = _split(self.lord, self.start, self.end, self.level + 1)
+        return self._children
+
+    def overlaps(self, start, end):
+        return (end is None or self.start < end) and (start is None or self.end > start)
+
+    def to_dict(self):
+        return {
+            "lord": self.lord,
+            "level": LEVELS[self.level],
+            "start": self.start.isoformat(),
+            "end": self.end.isoformat(),
+        }
+
+
+def _split(first_lord, start, end, level):
+    """Nine periods covering [start, end), beginning with first_lord"""
+    span = end - start
+    offset = DASHA_ORDER.index(first_lord)
+    periods = []
+    for i in range(9):
+        lord = DASHA_ORDER[(offset + i) % 9]
+        # The last one ends exactly at end, without accumulated rounding
+        finish = end if i == 8 else start + span * DASHA_YEARS[lord] / CYCLE_YEARS
+        periods.append(DashaPeriod(lord, start, finish, level))
+        start = finish
+    return periods
+
+
+class DashaTimeline:
+    def __init__(self, moon_longitude, birth):
+        moon_longitude %= 360.0
+        nakshatra = int(moon_longitude // NAKSHATRA_SPAN)
+        elapsed = (moon_longitude % NAKSHATRA_SPAN) / NAKSHATRA_SPAN
+        first_lord = DASHA_ORDER[nakshatra % 9]
+
+        self.birth = birth
+        self.first_lord = first_lord
+        self.balance_years = DASHA_YEARS[first_lord] * (1 - elapsed)
+        # The cycle notionally began before birth, by the part already elapsed
+        cycle_start = birth - timedelta(days=DASHA_YEARS[first_lord] * elapsed * YEAR_DAYS)
+        cycle_end = cycle_start + timedelta(days=CYCLE_YEARS * YEAR_DAYS)
+        self.mahadashas = _split(first_lord, cycle_start, cycle_end, 0)
+
+    def periods(self, depth=2, start=None, end=None):
+        """Nested periods down to depth levels, limited to those overlapping [start, end)"""
+        depth = max(1, min(depth, len(LEVELS)))
+
+        def expand(periods, level):
+            result = []
+            for period in periods:
+                if not period.overlaps(start, end):
+                    continue
+                entry = period.to_dict()
+                if level + 1 < depth:
+                    entry['periods'] = expand(period.children, level + 1)
+                result.append(entry)
+            return result
+
+        return expand(self.mahadashas, 0)
+
+    def current(self, at, depth=3):
+        """Chain of periods running at the given datetime, outermost first"""
+        chain = []
+        periods = self.mahadashas
+        for _ in range(max(1, min(depth, len(LEVELS)))):
+            period = next((p for p in periods if p.start <= at < p.end), None)
+            if period is None:
+                break
+            chain.append(period.to_dict())
+            periods = period.children
+        return chain
+
+
+timelines = TTLCache(
+    max_entries=int(os.getenv('DASHA_CACHE_MAX_ENTRIES', 10000)),
+    ttl=int(os.getenv('DASHA_CACHE_TTL', 86400)),
+)
+
+
+def get_timeline(moon_longitude, birth):
+    """Memoized timeline for one chart"""
+    key = (round(moon_longitude % 360.0, 6), birth.isoformat())
+    timeline = timelines.get(key)
+    if timeline is None:
+        timeline = DashaTimeline(moon_longitude, birth)
+        timelines.set(key, timeline)
+    return timeline
+
+
+def moon_longitude_of(planet_positions):
+    """Natal Moon longitude from a processed chart's planet_positions, or None"""
+    for entry in planet_positions or []:
+        if entry.get('planet') == 'Moon':
+            return entry.get('longitude')
+    return None
@@ -0,0 +1,158 @@
+"""
+Persistent on-disk cache for processed kundli results.
+
+Backed by SQLite in WAL mode so several uvicorn workers on the same machine
+can read concurrently while one writes, and so hot charts survive restarts
+and deploys. Entries expire after a TTL and the table is compacted back under
+a size cap every few hundred writes.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Only bump an entry's access time when it is older than this, so hot reads
+# do not turn into a write on every request
+TOUCH_INTERVAL = 60
+
+
+class DiskCache:
+    def __init__(self, path, max_entries=100000, ttl=30 * 86400, compact_every=500):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.compact_every = compact_every
+        self._conn = None
+        self._lock = threading.Lock()
+        self._writes_since_compact = 0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.compactions = 0
+        self.errors = 0
+
+    def open(self):
+        if self._conn is not None or not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        # auto_vacuum only takes effect on a fresh database, before any table exists
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS kundli_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_kundli_cache_accessed ON kundli_cache (accessed_at)")
+        self._conn = conn
+        print(f"[DISK CACHE] Opened {self.path}")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get(self, key):
+        if self._conn is None:
+            return None
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value, expires_at, accessed_at FROM kundli_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or row[1] <= now:
+                    self.misses += 1
+                    return None
+                if now - row[2] > TOUCH_INTERVAL:
+                    self._conn.execute("UPDATE kundli_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return json.loads(row[0])
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"[DISK CACHE] Read failed: {str(e)}")
+            return None
+
+    def set(self, key, value):
+        if self._conn is None:
+            return
+        now = time.time()
+        try:
+            payload = json.dumps(value)
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO kundli_cache (key, value, created_at, expires_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (key, payload, now, now + self.ttl, now)
+                )
+                self.writes += 1
+                self._writes_since_compact += 1
+            if self._writes_since_compact >= self.compact_every:
+                self.compact()
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            self.errors += 1
+            print(f"[DISK CACHE] Write failed: {str(e)}")
+
+    def compact(self):
+        """Drop expired entries, trim to max_entries by LRU and reclaim space"""
+        if self._conn is None:
+            return
+        with self._lock:
+            self._writes_since_compact = 0
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.execute("DELETE FROM kundli_cache WHERE expires_at <= ?", (time.time(),))
+                self._conn.execute(
+                    "DELETE FROM kundli_cache WHERE key IN ("
+                    " SELECT key FROM kundli_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+                self._conn.execute("COMMIT")
+                self._conn.execute("PRAGMA incremental_vacuum")
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                self.compactions += 1
+            except sqlite3.Error as e:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                self.errors += 1
+                print(f"[DISK CACHE] Compaction failed: {str(e)}")
+
+    def stats(self):
+        size = None
+        if self._conn is not None:
+            try:
+                with self._lock:
+                    size = self._conn.execute("SELECT COUNT(*) FROM kundli_cache").fetchone()[0]
+            except sqlite3.Error:
+                pass
+        return {
+            "enabled": self._conn is not None,
+            "path": self.path,
+            "size": size,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "compactions": self.compactions,
+            "errors": self.errors,
+        }
+
+
+kundli_disk_cache = DiskCache(
+    os.getenv('KUNDLI_DISK_CACHE_PATH', 'cache/kundli_cache.db'),
+    max_entries=int(os.getenv('KUNDLI_DISK_CACHE_MAX_ENTRIES', 100000)),
+    ttl=int(os.getenv('KUNDLI_DISK_CACHE_TTL', 30 * 86400)),
+)
@@ -0,0 +1,364 @@
+"""
+Local sidereal ephemeris (Lahiri ayanamsa).
+
+Computes the nine grahas (Sun through Ketu) and the Ascendant from a UTC
+birth time and coordinates, so charts no longer need ProKerala's
+planet-position endpoint. Everything is written with NumPy ufuncs and works on
+scalars or arrays of Julian days alike.
+
+Models:
+- Sun: Meeus, Astronomical Algorithms ch. 25 (~0.01 deg)
+- Moon: Meeus ch. 47, main periodic terms (~0.01 deg)
+- Mercury..Saturn: mean orbital elements of date with the main Jupiter/Saturn
+  perturbations, after Paul Schlyter's "How to compute planetary positions"
+  (~1-2 arcmin)
+- Rahu: mean lunar node, Ketu opposite it
+- Ascendant: from local sidereal time and the obliquity of the ecliptic
+
+When the precomputed table from ephemeris_table.py is present, planet
+longitudes and speeds inside its range come from the memory-mapped table
+instead of the models.
+"""
+
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+import ephemeris_table
+
+J2000 = 2451545.0
+# Lahiri ayanamsa at J2000 (mean, Swiss Ephemeris SIDM_LAHIRI)
+LAHIRI_J2000 = 23.857092
+
+PLANETS = ['Sun', 'Moon', 'Mercury', 'Venus', 'Mars', 'Jupiter', 'Saturn', 'Rahu', 'Ketu']
+# ProKerala planet ids, so local output can stand in for planet-position
+PLANET_IDS = {
+    'Sun': 0, 'Moon': 1, 'Mercury': 2, 'Venus': 3, 'Mars': 4,
+    'Jupiter': 5, 'Saturn': 6, 'Ascendant': 100, 'Rahu': 101, 'Ketu': 102
+}
+RASI_NAMES = [
+    'Mesha', 'Vrishabha', 'Mithuna', 'Karka', 'Simha', 'Kanya',
+    'Tula', 'Vrischika', 'Dhanu', 'Makara', 'Kumbha', 'Meena'
+]
+NAKSHATRA_NAMES = [
+    'Ashwini', 'Bharani', 'Krittika', 'Rohini', 'Mrigashira', 'Ardra',
+    'Punarvasu', 'Pushya', 'Ashlesha', 'Magha', 'Purva Phalguni', 'Uttara Phalguni',
+    'Hasta', 'Chitra', 'Swati', 'Vishakha', 'Anuradha', 'Jyeshta',
+    'Mula', 'Purva Ashadha', 'Uttara Ashadha', 'Shravana', 'Dhanishta', 'Shatabhisha',
+    'Purva Bhadrapada', 'Uttara Bhadrapada', 'Revati'
+]
+NAKSHATRA_SPAN = 360.0 / 27
+
+# Moon longitude terms (Meeus table 47.A): multiples of D, M, M', F and the
+# sine coefficient in 1e-6 degrees
+_MOON_TERMS = np.array([
+    (0, 0, 1, 0, 6288774), (2, 0, -1, 0, 1274027), (2, 0, 0, 0, 658314),
+    (0, 0, 2, 0, 213618), (0, 1, 0, 0, -185116), (0, 0, 0, 2, -114332),
+    (2, 0, -2, 0, 58793), (2, -1, -1, 0, 57066), (2, 0, 1, 0, 53322),
+    (2, -1, 0, 0, 45758), (0, 1, -1, 0, -40923), (1, 0, 0, 0, -34720),
+    (0, 1, 1, 0, -30383), (2, 0, 0, -2, 15327), (0, 0, 1, 2, -12528),
+    (0, 0, 1, -2, 10980), (4, 0, -1, 0, 10675), (0, 0, 3, 0, 10034),
+    (4, 0, -2, 0, 8548), (2, 1, -1, 0, -7888), (2, 1, 0, 0, -6766),
+    (1, 0, -1, 0, -5163), (1, 1, 0, 0, 4987), (2, -1, 1, 0, 4036),
+    (2, 0, 2, 0, 3994), (4, 0, 0, 0, 3861), (2, 0, -3, 0, 3665),
+    (0, 1, -2, 0, -2689), (2, 0, -1, 2, -2602), (2, -1, -2, 0, 2390),
+    (1, 0, 1, 0, -2348), (2, -2, 0, 0, 2236), (0, 1, 2, 0, -2120),
+    (0, 2, 0, 0, -2069), (2, -2, -1, 0, 2048), (2, 0, 1, -2, -1773),
+    (2, 0, 0, 2, -1595), (4, -1, -1, 0, 1215), (0, 0, 2, 2, -1110),
+    (3, 0, -1, 0, -892), (2, 1, 1, 0, -810), (4, -1, -2, 0, 759),
+    (0, 2, -1, 0, -713), (2, 2, -1, 0, -700), (2, 1, -2, 0, 691),
+    (2, -1, 0, -2, 596), (4, 0, 1, 0, 549), (0, 0, 4, 0, 537),
+    (4, -1, 0, 0, 520), (1, 0, -2, 0, -487), (2, 1, 0, -2, -399),
+    (0, 0, 2, -2, -381), (1, 1, 1, 0, 351), (3, 0, -2, 0, -340),
+    (4, 0, -3, 0, 330), (2, -1, 2, 0, 327), (0, 2, 1, 0, -323),
+    (1, 1, -1, 0, 299), (2, 0, 3, 0, 294),
+], dtype=float)
+
+# Orbital elements of date (Schlyter): N, i, w, a, e, M as (value, rate per day)
+# counted from JD 2451543.5
+_ELEMENTS = {
+    'Mercury': ((48.3313, 3.24587e-5), (7.0047, 5.00e-8), (29.1241, 1.01444e-5),
+                (0.387098, 0.0), (0.205635, 5.59e-10), (168.6562, 4.0923344368)),
+    'Venus': ((76.6799, 2.46590e-5), (3.3946, 2.75e-8), (54.8910, 1.38374e-5),
+              (0.723330, 0.0), (0.006773, -1.302e-9), (48.0052, 1.6021302244)),
+    'Mars': ((49.5574, 2.11081e-5), (1.8497, -1.78e-8), (286.5016, 2.92961e-5),
+             (1.523688, 0.0), (0.093405, 2.516e-9), (18.6021, 0.5240207766)),
+    'Jupiter': ((100.4542, 2.76854e-5), (1.3030, -1.557e-7), (273.8777, 1.64505e-5),
+                (5.20256, 0.0), (0.048498, 4.469e-9), (19.8950, 0.0830853001)),
+    'Saturn': ((113.6634, 2.38980e-5), (2.4886, -1.081e-7), (339.3939, 2.97661e-5),
+               (9.55475, 0.0), (0.055546, -9.499e-9), (316.9670, 0.0334442282)),
+}
+_SUN_ELEMENTS = ((282.9404, 4.70935e-5), (0.016709, -1.151e-9), (356.0470, 0.9856002585))
+
+
+def julian_day(dt):
+    """Julian day (UT) of a datetime; naive datetimes are taken as UTC"""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    a = (14 - dt.month) // 12
+    y = dt.year + 4800 - a
+    m = dt.month + 12 * a - 3
+    jdn = dt.day + (153 * m + 2) // 5 + 365 * y + y // 4 - y // 100 + y // 400 - 32045
+    day_fraction = (dt.hour - 12) / 24 + dt.minute / 1440 + (dt.second + dt.microsecond / 1e6) / 86400
+    return jdn + day_fraction
+
+
+def _centuries(jd):
+    return (np.asarray(jd, dtype=float) - J2000) / 36525.0
+
+
+def lahiri_ayanamsa(jd):
+    t = _centuries(jd)
+    return LAHIRI_J2000 + (5028.796195 * t + 1.1054348 * t * t) / 3600.0
+
+
+def _sun_tropical(t):
+    l0 = 280.46646 + 36000.76983 * t + 0.0003032 * t * t
+    m = np.radians(357.52911 + 35999.05029 * t - 0.0001537 * t * t)
+    c = ((1.914602 - 0.004817 * t - 0.000014 * t * t) * np.sin(m)
+         + (0.019993 - 0.000101 * t) * np.sin(2 * m)
+         + 0.000289 * np.sin(3 * m))
+    omega = np.radians(125.04 - 1934.136 * t)
+    return l0 + c - 0.00569 - 0.00478 * np.sin(omega)
+
+
+def _moon_tropical(t):
+    t2, t3, t4 = t * t, t ** 3, t ** 4
+    lp = 218.3164477 + 481267.88123421 * t - 0.0015786 * t2 + t3 / 538841 - t4 / 65194000
+    d = 297.8501921 + 445267.1114034 * t - 0.0018819 * t2 + t3 / 545868 - t4 / 113065000
+    m = 357.5291092 + 35999.0502909 * t - 0.0001536 * t2 + t3 / 24490000
+    mp = 134.9633964 + 477198.8675055 * t + 0.0087414 * t2 + t3 / 69699 - t4 / 14712000
+    f = 93.2720950 + 483202.0175233 * t - 0.0036539 * t2 - t3 / 3526000 + t4 / 863310000
+    e = 1 - 0.002516 * t - 0.0000074 * t2
+
+    args = np.radians(np.multiply.outer(_MOON_TERMS[:, 0], d)
+                      + np.multiply.outer(_MOON_TERMS[:, 1], m)
+                      + np.multiply.outer(_MOON_TERMS[:, 2], mp)
+                      + np.multiply.outer(_MOON_TERMS[:, 3], f))
+    # Terms involving the Sun's anomaly shrink with the Earth's eccentricity
+    m_power = np.abs(_MOON_TERMS[:, 1]).reshape((-1,) + (1,) * np.ndim(t))
+    coefficients = _MOON_TERMS[:, 4].reshape(m_power.shape) * e ** m_power
+    sigma = np.sum(coefficients * np.sin(args), axis=0)
+
+    a1 = np.radians(119.75 + 131.849 * t)
+    a2 = np.radians(53.09 + 479264.290 * t)
+    sigma = sigma + 3958 * np.sin(a1) + 1962 * np.sin(np.radians(lp - f)) + 318 * np.sin(a2)
+    return lp + sigma / 1e6
+
+
+def _solve_kepler(m, e):
+    ecc = m + e * np.sin(m) * (1 + e * np.cos(m))
+    for _ in range(5):
+        ecc = ecc - (ecc - e * np.sin(ecc) - m) / (1 - e * np.cos(ecc))
+    return ecc
+
+
+def _heliocentric(elements, d):
+    """Heliocentric ecliptic rectangular coordinates and mean anomaly (radians)"""
+    (n, i, w, a, e, m) = [value + rate * d for value, rate in elements]
+    n, i, w, m = np.radians(n), np.radians(i), np.radians(w), np.radians(m)
+    ecc = _solve_kepler(m, e)
+    xv = a * (np.cos(ecc) - e)
+    yv = a * np.sqrt(1 - e * e) * np.sin(ecc)
+    v = np.arctan2(yv, xv)
+    r = np.hypot(xv, yv)
+    x = r * (np.cos(n) * np.cos(v + w) - np.sin(n) * np.sin(v + w) * np.cos(i))
+    y = r * (np.sin(n) * np.cos(v + w) + np.cos(n) * np.sin(v + w) * np.cos(i))
+    z = r * np.sin(v + w) * np.sin(i)
+    return x, y, z, m
+
+
+def _planets_tropical(jd):
+    """Geocentric tropical longitudes of Mercury..Saturn, in PLANETS order"""
+    d = np.asarray(jd, dtype=float) - 2451543.5
+
+    # Earth = minus the geocentric Sun
+    (w, _), (e, _), (m, _) = _SUN_ELEMENTS
+    sun_w = np.radians(w + _SUN_ELEMENTS[0][1] * d)
+    sun_e = e + _SUN_ELEMENTS[1][1] * d
+    sun_m = np.radians(m + _SUN_ELEMENTS[2][1] * d)
+    ecc = _solve_kepler(sun_m, sun_e)
+    xv = np.cos(ecc) - sun_e
+    yv = np.sqrt(1 - sun_e * sun_e) * np.sin(ecc)
+    sun_lon = np.arctan2(yv, xv) + sun_w
+    sun_r = np.hypot(xv, yv)
+    earth_x, earth_y = -sun_r * np.cos(sun_lon), -sun_r * np.sin(sun_lon)
+
+    positions = {name: _heliocentric(elements, d) for name, elements in _ELEMENTS.items()}
+    mj = positions['Jupiter'][3]
+    ms = positions['Saturn'][3]
+
+    longitudes = []
+    for name in ('Mercury', 'Venus', 'Mars', 'Jupiter', 'Saturn'):
+        x, y, z, _ = positions[name]
+        if name in ('Jupiter', 'Saturn'):
+            # Mutual perturbations (the "great inequality" and friends)
+            lon = np.arctan2(y, x)
+            r = np.sqrt(x * x + y * y + z * z)
+            lat = np.arcsin(z / r)
+            if name == 'Jupiter':
+                lon = lon + np.radians(
+                    -0.332 * np.sin(2 * mj - 5 * ms - np.radians(67.6))
+                    - 0.056 * np.sin(2 * mj - 2 * ms + np.radians(21))
+                    + 0.042 * np.sin(3 * mj - 5 * ms + np.radians(21))
+                    - 0.036 * np.sin(mj - 2 * ms)
+                    + 0.022 * np.cos(mj - ms)
+                    + 0.023 * np.sin(2 * mj - 3 * ms + np.radians(52))
+                    - 0.016 * np.sin(mj - 5 * ms - np.radians(69)))
+            else:
+                lon = lon + np.radians(
+                    0.812 * np.sin(2 * mj - 5 * ms - np.radians(67.6))
+                    - 0.229 * np.cos(2 * mj - 4 * ms - np.radians(2))
+                    + 0.119 * np.sin(mj - 2 * ms - np.radians(3))
+                    + 0.046 * np.sin(2 * mj - 6 * ms - np.radians(69))
+                    + 0.014 * np.sin(mj - 3 * ms + np.radians(32)))
+                lat = lat + np.radians(
+                    -0.020 * np.cos(2 * mj - 4 * ms - np.radians(2))
+                    + 0.018 * np.sin(2 * mj - 6 * ms - np.radians(49)))
+            x = r * np.cos(lon) * np.cos(lat)
+            y = r * np.sin(lon) * np.cos(lat)
+        longitudes.append(np.degrees(np.arctan2(y - earth_y, x - earth_x)))
+    return longitudes
+
+
+def _mean_node_tropical(t):
+    return 125.0445479 - 1934.1362891 * t + 0.0020754 * t * t + t ** 3 / 467441
+
+
+def tropical_longitudes(jd):
+    """Tropical longitudes of the nine grahas, shape (9,) + shape(jd)"""
+    t = _centuries(jd)
+    rahu = _mean_node_tropical(t)
+    longitudes = [_sun_tropical(t), _moon_tropical(t)] + _planets_tropical(jd) + [rahu, rahu + 180.0]
+    return np.mod(np.array(longitudes), 360.0)
+
+
+def compute_sidereal_longitudes(jd):
+    """Lahiri sidereal longitudes of the nine grahas from the analytic models"""
+    return np.mod(tropical_longitudes(jd) - lahiri_ayanamsa(jd), 360.0)
+
+
+def compute_daily_speeds(jd, step=0.5):
+    """Longitude speeds in degrees/day by central difference of the analytic models"""
+    jd = np.asarray(jd, dtype=float)
+    delta = tropical_longitudes(jd + step) - tropical_longitudes(jd - step)
+    # Unwrap across 0/360
+    delta = np.mod(delta + 180.0, 360.0) - 180.0
+    return delta / (2 * step)
+
+
+def sidereal_longitudes(jd):
+    """Lahiri sidereal longitudes of the nine grahas, shape (9,) + shape(jd)"""
+    if _table is not None and _table.covers(jd):
+        return _table.lookup(jd)[0]
+    return compute_sidereal_longitudes(jd)
+
+
+def daily_speeds(jd):
+    """Longitude speeds in degrees/day, shape (9,) + shape(jd)"""
+    if _table is not None and _table.covers(jd):
+        return _table.lookup(jd)[1]
+    return compute_daily_speeds(jd)
+
+
+def load_table(path=None):
+    """Memory-map the precomputed table (see ephemeris_table.py) if it exists"""
+    global _table
+    path = path or os.getenv('EPHEMERIS_TABLE_PATH', ephemeris_table.DEFAULT_PATH)
+    if not os.path.exists(path):
+        print(f"[EPHEMERIS] No table at {path}, computing positions analytically")
+        return None
+    try:
+        _table = ephemeris_table.EphemerisTable(path)
+        print(f"[EPHEMERIS] Using table {path}")
+    except (OSError, ValueError) as e:
+        print(f"[EPHEMERIS] Could not load table {path}: {str(e)}")
+    return _table
+
+
+def ascendant(jd, lat, lon):
+    """Lahiri sidereal longitude of the Ascendant; lon is east-positive"""
+    jd = np.asarray(jd, dtype=float)
+    t = _centuries(jd)
+    gmst = 280.46061837 + 360.98564736629 * (jd - J2000) + 0.000387933 * t * t - t ** 3 / 38710000
+    ramc = np.radians(np.mod(gmst + lon, 360.0))
+    eps = np.radians(23.4392911 - 0.0130042 * t)
+    phi = np.radians(lat)
+    asc = np.degrees(np.arctan2(np.cos(ramc), -(np.sin(eps) * np.tan(phi) + np.cos(eps) * np.sin(ramc))))
+    return np.mod(asc - lahiri_ayanamsa(jd), 360.0)
+
+
+def rasi(longitude):
+    index = int(longitude // 30) % 12
+    return {"id": index, "name": RASI_NAMES[index]}
+
+
+def nakshatra(longitude):
+    index = int(longitude // NAKSHATRA_SPAN) % 27
+    pada = int((longitude % NAKSHATRA_SPAN) // (NAKSHATRA_SPAN / 4)) + 1
+    return {"id": index, "name": NAKSHATRA_NAMES[index], "pada": pada}
+
+
+def planet_positions(dt, lat, lon):
+    """Ascendant and grahas in the shape of ProKerala's planet_position list"""
+    jd = julian_day(dt)
+    if _table is not None and _table.covers(jd):
+        longitudes, speeds = _table.lookup(jd)
+    else:
+        longitudes, speeds = compute_sidereal_longitudes(jd), compute_daily_speeds(jd)
+    asc = float(ascendant(jd, lat, lon))
+    asc_rasi = int(asc // 30)
+
+    entries = [('Ascendant', asc, 0.0)]
+    entries += [(name, float(longitudes[i]), float(speeds[i])) for i, name in enumerate(PLANETS)]
+
+    positions = []
+    for name, longitude, speed in entries:
+        sign = int(longitude // 30)
+        positions.append({
+            "id": PLANET_IDS[name],
+            "name": name,
+            "longitude": round(longitude, 6),
+            "degree": round(longitude - sign * 30, 6),
+            "speed": round(speed, 6),
+            "position": (sign - asc_rasi) % 12 + 1,
+            "rasi": rasi(longitude),
+            "nakshatra": nakshatra(longitude),
+            # Mean nodes always move backwards
+            "is_retrograde": name in ('Rahu', 'Ketu') or speed < 0,
+        })
+    return positions
+
+
+def local_kundli(dt, lat, lon):
+    """
+    Compute a chart locally and return (kundli_data, planet_data) shaped like the
+    ProKerala kundli/advanced and planet-position responses
+    """
+    planets = planet_positions(dt, lat, lon)
+    by_name = {planet['name']: planet for planet in planets}
+    kundli_data = {
+        "data": {
+            "nakshatra_details": {
+                "nakshatra": nakshatra(by_name['Moon']['longitude']),
+                "soorya_rasi": by_name['Sun']['rasi'],
+                "chandra_rasi": by_name['Moon']['rasi'],
+                "zodiac": by_name['Ascendant']['rasi'],
+            }
+        }
+    }
+    planet_data = {"data": {"planet_position": planets}}
+    return kundli_data, planet_data
+
+
+def parse_datetime(value):
+    """Parse an ISO datetime such as ProKerala's '1990-01-01T10:30:00+05:30'"""
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+_table = None
+load_table()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Precomputed, memory-mapped ephemeris tables.
+
+A build step samples the sidereal longitude and daily speed of all nine grahas
+(in ephemeris.PLANETS order) at a fixed step over 1900-2100 and writes them to
+one compact float32 file. Servers memory-map that file, so startup is instant
+and every worker shares the same physical pages, and answer position lookups
+with an O(1) index plus cubic Hermite interpolation.
+
+Usage:
+    python ephemeris_table.py build [path] [--step DAYS]
+    python ephemeris_table.py check [path]
+"""
+
+import os
+import struct
+import sys
+
+import numpy as np
+
+MAGIC = b'AEPH'
+VERSION = 1
+# magic, version, start_jd, step (days), row count, planet count
+HEADER = struct.Struct('<4sIddII')
+HEADER_SIZE = 64
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'ephemeris_1900_2100.bin')
+START_JD = 2415020.5  # 1900-01-01
+END_JD = 2488070.5    # 2100-01-01
+DEFAULT_STEP = 1.0
+BUILD_CHUNK = 4096
+
+
+class EphemerisTable:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            magic, version, start_jd, step, count, planets = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} ephemeris table")
+        self.path = path
+        self.start_jd = start_jd
+        self.step = step
+        self.count = count
+        # (row, planet, [longitude, speed])
+        self.data = np.memmap(path, dtype='<f4', mode='r', offset=HEADER_SIZE, shape=(count, planets, 2))
+        self.end_jd = start_jd + step * (count - 1)
+
+    def covers(self, jd):
+        jd = np.asarray(jd)
+        return bool(np.all((jd >= self.start_jd) & (jd < self.end_jd)))
+
+    def lookup(self, jd):
+        """Interpolated (longitudes, speeds), each shaped (planets,) + shape(jd)"""
+        jd = np.asarray(jd, dtype=float)
+        position = (jd - self.start_jd) / self.step
+        row = np.floor(position).astype(np.intp)
+        u = position - row
+
+        left = self.data[row].astype(float)
+        right = self.data[row + 1].astype(float)
+        p0, v0 = left[..., 0], left[..., 1]
+        # Unwrap the right-hand sample across 0/360
+        p1 = p0 + np.mod(right[..., 0] - p0 + 180.0, 360.0) - 180.0
+        v1 = right[..., 1]
+        m0, m1 = v0 * self.step, v1 * self.step
+
+        # Cubic Hermite using the stored speeds as tangents
+        u = u[..., np.newaxis]
+        u2, u3 = u * u, u * u * u
+        longitude = ((2 * u3 - 3 * u2 + 1) * p0 + (u3 - 2 * u2 + u) * m0
+                     + (-2 * u3 + 3 * u2) * p1 + (u3 - u2) * m1)
+        speed = ((6 * u2 - 6 * u) * p0 + (3 * u2 - 4 * u + 1) * m0
+                 + (-6 * u2 + 6 * u) * p1 + (3 * u2 - 2 * u) * m1) / self.step
+
+        # Planets first, to match ephemeris.sidereal_longitudes
+        return np.moveaxis(np.mod(longitude, 360.0), -1, 0), np.moveaxis(speed, -1, 0)
+
+
+def build(path=DEFAULT_PATH, step=DEFAULT_STEP, start_jd=START_JD, end_jd=END_JD):
+    """Sample the analytic ephemeris and write a table file"""
+    import ephemeris
+
+    count = int(round((end_jd - start_jd) / step)) + 1
+    planets = len(ephemeris.PLANETS)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, start_jd, step, count, planets).ljust(HEADER_SIZE, b'\0'))
+        for start in range(0, count, BUILD_CHUNK):
+            jd = start_jd + step * np.arange(start, min(start + BUILD_CHUNK, count))
+            rows = np.empty((len(jd), planets, 2), dtype='<f4')
+            rows[..., 0] = ephemeris.compute_sidereal_longitudes(jd).T
+            rows[..., 1] = ephemeris.compute_daily_speeds(jd).T
+            f.write(rows.tobytes())
+    # Atomic swap, so running workers keep their mapping of the old file
+    os.replace(tmp_path, path)
+    print(f"✅ Wrote {count} rows x {planets} planets ({os.path.getsize(path) / 1e6:.1f} MB) to {path}")
+
+
+def check(path=DEFAULT_PATH, samples=20000):
+    """Compare interpolated lookups against the analytic ephemeris"""
+    import ephemeris
+
+    table = EphemerisTable(path)
+    jd = np.random.default_rng(0).uniform(table.start_jd, table.end_jd, samples)
+    longitudes, _ = table.lookup(jd)
+    error = np.abs(np.mod(longitudes - ephemeris.compute_sidereal_longitudes(jd) + 180.0, 360.0) - 180.0)
+    for name, planet_error in zip(ephemeris.PLANETS, error):
+        print(f"{name:8s} max error {planet_error.max() * 3600:.3f}\"")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args or args[0] not in ('build', 'check'):
+        print(__doc__)
+        sys.exit(1)
+    command = args.pop(0)
+    step = DEFAULT_STEP
+    if '--step' in args:
+        index = args.index('--step')
+        step = float(args[index + 1])
+        del args[index:index + 2]
+    target = args[0] if args else DEFAULT_PATH
+    if command == 'build':
+        build(target, step=step)
+    else:
+        check(target)
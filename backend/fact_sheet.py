@@ -0,0 +1,106 @@
+"""
+Compact kundli fact sheets for LLM prompts.
+
+A raw ProKerala payload is thousands of tokens of JSON, most of it irrelevant
+to a question. The sheet keeps what an answer is built on (the sun, moon and
+rising signs and one line per planet: sign, house, degree, retrograde) in a
+few hundred characters. It is generated once when a kundli is cached and
+stored with it.
+
+Both the raw ProKerala shape (data.planet_position, data.nakshatra_details)
+and the processed shape served by fastapi_server (planet_positions,
+sun_sign, ...) are understood.
+"""
+
+import re
+
+PLANET_ORDER = ['Ascendant', 'Sun', 'Moon', 'Mars', 'Mercury', 'Jupiter', 'Venus', 'Saturn', 'Rahu', 'Ketu']
+
+_NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+
+
+def _number(value):
+    """12, '12', '12.34°' or 'House 5' -> a float, or None"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER.search(str(value or ''))
+    return float(match.group()) if match else None
+
+
+def _name(value):
+    """ProKerala nests names as {'id': .., 'name': ..}; processed data has plain strings"""
+    if isinstance(value, dict):
+        return value.get('name')
+    return value
+
+
+def _data(payload):
+    data = payload.get('data')
+    return data if isinstance(data, dict) else {}
+
+
+def _details(payload):
+    return _data(payload).get('nakshatra_details') or {}
+
+
+def _planets(payload):
+    """(planet, sign, house, degree, retrograde) from either payload shape"""
+    if payload.get('planet_positions'):
+        return [(p.get('planet'), p.get('sign'), _number(p.get('house')), _number(p.get('degree')),
+                 bool(p.get('retrograde')))
+                for p in payload['planet_positions']]
+    return [(p.get('name'), _name(p.get('rasi')), _number(p.get('position')), _number(p.get('degree')),
+             bool(p.get('is_retrograde')))
+            for p in _data(payload).get('planet_position') or []]
+
+
+def _signs(payload, planets):
+    """Sun, moon and rising signs, falling back to the planet lines"""
+    details = _details(payload)
+    by_planet = {planet: sign for planet, sign, *_ in planets}
+    signs = {
+        'Sun sign': (payload.get('sun_sign'), _name(details.get('soorya_rasi')), by_planet.get('Sun')),
+        'Moon sign': (payload.get('moon_sign'), _name(details.get('chandra_rasi')), by_planet.get('Moon')),
+        'Rising sign': (payload.get('rising_sign'), _name(details.get('zodiac')), by_planet.get('Ascendant')),
+    }
+    # 'Unknown'/'Error' placeholders from the processed shape carry no information
+    known = {label: next((s for s in candidates if s and s not in ('Unknown', 'Error')), None)
+             for label, candidates in signs.items()}
+    return {label: sign for label, sign in known.items() if sign}
+
+
+def _moon_star(payload):
+    moon = payload.get('moon') or {}
+    details = _details(payload)
+    nakshatra = moon.get('nakshatra') or _name(details.get('nakshatra'))
+    pada = moon.get('pada') or (details.get('nakshatra') or {}).get('pada')
+    if not nakshatra:
+        return None
+    return f"{nakshatra} pada {pada}" if pada else nakshatra
+
+
+def build_fact_sheet(payload):
+    """Plain-text fact sheet for a kundli payload, or None if it has no chart facts"""
+    if not isinstance(payload, dict):
+        return None
+    planets = _planets(payload)
+    signs = _signs(payload, planets)
+    if not planets and not signs:
+        return None
+
+    lines = [f"{label}: {sign}" for label, sign in signs.items()]
+    star = _moon_star(payload)
+    if star:
+        lines.append(f"Moon nakshatra: {star}")
+
+    rank = {name: i for i, name in enumerate(PLANET_ORDER)}
+    for planet, sign, house, degree, retrograde in sorted(planets, key=lambda p: rank.get(p[0], len(rank))):
+        parts = [sign or 'unknown sign']
+        if house is not None:
+            parts.append(f"house {int(house)}")
+        if degree is not None:
+            parts.append(f"{degree:.1f}°")
+        if retrograde and planet not in ('Rahu', 'Ketu'):
+            parts.append("retrograde")
+        lines.append(f"{planet}: {', '.join(parts)}")
+    return "\n".join(lines)
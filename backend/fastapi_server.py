@@ -1,14 +1,70 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from datetime import datetime
+from typing import Optional, List, Union
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+import asyncio
 import os
 import json
 
+import upstream
+from prokerala_auth import token_manager, TokenRefreshError
+from kundli_cache import kundli_cache, make_cache_key
+from coalesce import SingleFlight
+from disk_cache import kundli_disk_cache
+from ephemeris import local_kundli, parse_datetime, julian_day, sidereal_longitudes
+from batch_kundli import compute_charts
+from transits import transit_service
+import muhurat
+from matching import rank_matches
+import dasha
+from vargas import divisional_charts, VARGA_NAMES
+from geocoder import gazetteer
+import timezones
+
 # ProKerala API imports
 # from prokerala_api import ApiClient  # Not needed - using direct HTTP requests
 
-app = FastAPI(title="AstroAI Backend", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared keep-alive connection pool for all ProKerala calls
+    upstream.start()
+    # Keep a ProKerala token warm so requests never wait on /token
+    if KUNDLI_SOURCE != 'local':
+        token_manager.start()
+    # Persistent chart cache that survives restarts
+    kundli_disk_cache.open()
+    # Offset tables for the zones most births fall in
+    timezones.preload()
+    yield
+    kundli_disk_cache.close()
+    await token_manager.stop()
+    await upstream.close()
+
+# Where planet positions come from:
+#   local      - in-process ephemeris only, no ProKerala calls or credits
+#   prokerala  - ProKerala, with the local ephemeris filling in failed endpoints
+#   crosscheck - ProKerala, plus a comparison against the local ephemeris
+KUNDLI_SOURCE = os.getenv('KUNDLI_SOURCE', 'local')
+# Degrees of disagreement that get logged in crosscheck mode
+CROSSCHECK_TOLERANCE = float(os.getenv('KUNDLI_CROSSCHECK_TOLERANCE', 0.25))
+
+# Largest number of birth records accepted by one /kundli/batch call
+BATCH_MAX_RECORDS = int(os.getenv('KUNDLI_BATCH_MAX_RECORDS', 100000))
+
+# Longest time range one /muhurat/search call may scan
+MUHURAT_MAX_DAYS = int(os.getenv('MUHURAT_MAX_DAYS', 366))
+
+# Largest candidate list accepted by one /kundli/match call
+MATCH_MAX_CANDIDATES = int(os.getenv('MATCH_MAX_CANDIDATES', 100000))
+
+# In-flight /kundli fetches, keyed like the kundli cache
+kundli_flight = SingleFlight()
+
+app = FastAPI(title="AstroAI Backend", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -24,84 +80,226 @@ class KundliRequest(BaseModel):
     dob: str
     tob: str
     pob: str
+    # Resolved from pob with the bundled gazetteer when omitted
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    # IANA zone of the birth place; derived from pob or lat/lon when omitted
+    timezone: Optional[str] = None
+    # Divisional charts to include, e.g. [9, 10] for Navamsa and Dasamsa
+    divisions: Optional[List[int]] = None
+
+class BatchKundliRecord(BaseModel):
+    id: Optional[str] = None
+    dob: str
+    tob: str
+    pob: str = ""
+    lat: float
+    lon: float
+    timezone: Optional[str] = None
+
+class BatchKundliRequest(BaseModel):
+    records: List[BatchKundliRecord]
+
+class MuhuratRequest(BaseModel):
+    start: str
+    end: str
     lat: float
     lon: float
+    tithis: Optional[List[int]] = None
+    nakshatras: Optional[List[str]] = None
+    lagnas: Optional[List[str]] = None
+    exclude_retrograde: List[str] = ["Mercury"]
+    min_duration_minutes: int = 30
+    limit: int = 10
+
+class MatchChart(BaseModel):
+    id: Optional[str] = None
+    # 0-based ids (rasi_id/nakshatra_id from a /kundli response's "moon") or local names
+    moon_rasi: Union[int, str]
+    moon_nakshatra: Union[int, str]
+
+class MatchRequest(BaseModel):
+    query: MatchChart
+    candidates: List[MatchChart]
+    query_role: str = "groom"
+    top_k: int = 10
+    min_score: float = 0
+
+class DashaRequest(BaseModel):
+    dob: str
+    tob: str
+    # Birth place, for the local time's UTC offset (UTC when all are omitted)
+    pob: Optional[str] = None
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    timezone: Optional[str] = None
+    # Natal sidereal Moon longitude; computed from dob/tob when omitted
+    moon_longitude: Optional[float] = None
+    depth: int = 2
+    start: Optional[str] = None
+    end: Optional[str] = None
 
 class AskRequest(BaseModel):
     question: str
 
-import requests
-import json
+async def get_prokerala_access_token():
+    """Get ProKerala access token using client credentials"""
+    try:
+        return await token_manager.get_token()
+    except TokenRefreshError as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-# Global token cache
-access_token = None
-token_expires = 0
+def birth_details(request, zone, birth_iso):
+    return {
+        "date_of_birth": request.dob,
+        "time_of_birth": request.tob,
+        "place_of_birth": request.pob,
+        "timezone": zone,
+        "datetime": birth_iso
+    }
 
-def get_prokerala_access_token():
-    """Get ProKerala access token using client credentials"""
-    global access_token, token_expires
+def resolve_birth_place(request):
+    """Fill in missing lat/lon from pob; returns the gazetteer place used, if any"""
+    if request.lat is not None and request.lon is not None:
+        return None
+    place = gazetteer.resolve(request.pob)
+    if place is not None:
+        print(f"[GEOCODER] Resolved '{request.pob}' to {place['label']}")
+        request.lat, request.lon = place['latitude'], place['longitude']
+    return place
+
+def birth_timezone(request, place=None):
+    """IANA zone of a birth: explicit, from the resolved place, or nearest to lat/lon"""
+    if request.timezone:
+        return request.timezone
+    if place is not None:
+        return place['timezone']
+    if request.lat is not None and request.lon is not None:
+        return timezones.timezone_for(request.lat, request.lon)
+    return timezones.DEFAULT_TIMEZONE
+
+def current_dasha(planet_positions, birth):
+    """Mahadasha/antardasha/pratyantardasha running now, from the memoized timeline"""
+    moon_longitude = dasha.moon_longitude_of(planet_positions)
+    if moon_longitude is None:
+        return []
+    timeline = dasha.get_timeline(moon_longitude, birth)
+    return timeline.current(datetime.now(timezone.utc))
+
+def requested_vargas(processed_data, request):
+    """divisional_charts for the divisions a request asked for, if any"""
+    if not request.divisions:
+        return {}
+    return {"divisional_charts": divisional_charts(processed_data.get('planet_positions'), request.divisions)}
+
+async def fetch_prokerala(endpoint, params, headers):
+    """Fetch one ProKerala astrology endpoint and return its JSON body"""
+    url = f"https://api.prokerala.com/v2/astrology/{endpoint}"
+    response = await upstream.get(url, params=params, headers=headers)
+    response.raise_for_status()
+    return response.json()
+
+async def build_kundli(params, request):
+    """Build one processed chart from the configured KUNDLI_SOURCE"""
+    if KUNDLI_SOURCE == 'local':
+        return build_local_kundli(params, request)
     
-    client_id = os.getenv('PROKERALA_CLIENT_ID')
-    client_secret = os.getenv('PROKERALA_CLIENT_SECRET')
+    processed_data = await build_prokerala_kundli(params, request)
+    if KUNDLI_SOURCE == 'crosscheck':
+        processed_data['crosscheck'] = crosscheck_planets(processed_data, params)
+    return processed_data
+
+async def build_and_cache_kundli(cache_key, params, request):
+    """build_kundli, storing complete charts in the memory and disk caches (SingleFlight leader only)"""
+    processed_data = await build_kundli(params, request)
+    # Only complete charts are cached; ones patched up after an upstream failure should be retried
+    if not processed_data.get('warnings') and processed_data.get('sun_sign') != "Error":
+        cached_data = {**processed_data, "cached": True}
+        kundli_cache.set(cache_key, cached_data)
+        # SQLite may wait on other workers' locks or compact; keep it off the event loop
+        await run_in_threadpool(kundli_disk_cache.set, cache_key, cached_data)
+    return processed_data
+
+def build_local_kundli(params, request):
+    """Compute the chart in-process with the local ephemeris"""
+    lat, lon = (float(v) for v in params['coordinates'].split(','))
+    kundli_data, planet_data = local_kundli(parse_datetime(params['datetime']), lat, lon)
+    processed_data = process_real_kundli_data(
+        kundli_data, planet_data, request.dob, request.tob, request.pob, birth=parse_datetime(params['datetime'])
+    )
+    processed_data['source'] = "Local Ephemeris"
+    return processed_data
+
+async def build_prokerala_kundli(params, request):
+    """Fetch both ProKerala endpoints and process them into one chart"""
+    # Get access token
+    access_token = await get_prokerala_access_token()
     
-    print(f"[CREDENTIALS] Environment CLIENT_ID: {client_id[:8]}...{client_id[-8:] if client_id else 'None'}")
-    print(f"[CREDENTIALS] Environment CLIENT_SECRET: {client_secret[:8]}...{client_secret[-8:] if client_secret else 'None'}")
+    print(f"[API] Calling ProKerala API with params: {params}")
     
-    # Fallback to config file
-    if not client_id or not client_secret:
-        print("[CREDENTIALS] Environment variables not found, checking config.txt...")
-        try:
-            with open('config.txt', 'r') as f:
-                lines = f.read().strip().split('\n')
-                for line in lines:
-                    if line.startswith('PROKERALA_CLIENT_ID='):
-                        client_id = line.split('=')[1]
-                    elif line.startswith('PROKERALA_CLIENT_SECRET='):
-                        client_secret = line.split('=')[1]
-        except:
-            pass
-        
-        print(f"[CREDENTIALS] Config file CLIENT_ID: {client_id[:8]}...{client_id[-8:] if client_id else 'None'}")
-        print(f"[CREDENTIALS] Config file CLIENT_SECRET: {client_secret[:8]}...{client_secret[-8:] if client_secret else 'None'}")
+    # Make requests with Bearer token
+    headers = {
+        'Authorization': f'Bearer {access_token}',
+        'Content-Type': 'application/json'
+    }
     
-    if not client_id or not client_secret:
-        print("[CREDENTIALS] No valid credentials found!")
-        raise HTTPException(status_code=500, detail="ProKerala credentials not configured")
+    # Both endpoints take the same params, so fetch them concurrently
+    kundli_data, planet_data = await asyncio.gather(
+        fetch_prokerala('kundli/advanced', params, headers),
+        fetch_prokerala('planet-position', params, headers),
+        return_exceptions=True
+    )
     
-    print(f"[CREDENTIALS] Using CLIENT_ID: {client_id[:8]}...{client_id[-8:]}")
-    print(f"[CREDENTIALS] Using CLIENT_SECRET: {client_secret[:8]}...{client_secret[-8:]}")
+    # A failed endpoint is filled in from the local ephemeris
+    warnings = []
+    planets_local = isinstance(planet_data, Exception)
+    if isinstance(kundli_data, Exception) and isinstance(planet_data, Exception):
+        raise kundli_data
+    if isinstance(kundli_data, Exception) or isinstance(planet_data, Exception):
+        lat, lon = (float(v) for v in params['coordinates'].split(','))
+        local_kundli_data, local_planet_data = local_kundli(parse_datetime(params['datetime']), lat, lon)
+        if isinstance(kundli_data, Exception):
+            print(f"[WARN] kundli/advanced failed, using local ephemeris: {str(kundli_data)}")
+            warnings.append(f"kundli/advanced failed, signs computed locally: {str(kundli_data)}")
+            kundli_data = local_kundli_data
+        if isinstance(planet_data, Exception):
+            print(f"[WARN] planet-position failed, using local ephemeris: {str(planet_data)}")
+            warnings.append(f"planet-position failed, planets computed locally: {str(planet_data)}")
+            planet_data = local_planet_data
     
-    # Check if we have a valid token
-    import time
-    current_time = time.time()
-    if access_token and current_time < token_expires:
-        print(f"[TOKEN] Using cached access token")
-        return access_token
+    print(f"[API] ProKerala responses received successfully")
     
-    # Get new access token
-    print(f"[TOKEN] Requesting new access token...")
-    token_url = "https://api.prokerala.com/token"
-    token_data = {
-        'grant_type': 'client_credentials',
-        'client_id': client_id,
-        'client_secret': client_secret
-    }
+    # Process the data
+    processed_data = process_real_kundli_data(
+        kundli_data, planet_data, request.dob, request.tob, request.pob, birth=parse_datetime(params['datetime'])
+    )
+    if warnings:
+        processed_data['warnings'] = warnings
+    if planets_local:
+        processed_data['planets_source'] = "Local Ephemeris"
+    return processed_data
+
+def crosscheck_planets(processed_data, params):
+    """Compare ProKerala planet longitudes with the local ephemeris"""
+    if processed_data.get('planets_source') == "Local Ephemeris":
+        # Comparing the local ephemeris with itself would report a meaningless 0° pass
+        print(f"[CROSSCHECK] Skipped, planet-position fell back to the local ephemeris for {params}")
+        return {"skipped": "planet-position fell back to the local ephemeris", "max_deviation_deg": None, "deviations": {}}
+    lat, lon = (float(v) for v in params['coordinates'].split(','))
+    _, local_planet_data = local_kundli(parse_datetime(params['datetime']), lat, lon)
+    local_longitudes = {p['name']: p['longitude'] for p in local_planet_data['data']['planet_position']}
     
-    try:
-        response = requests.post(token_url, data=token_data)
-        response.raise_for_status()
-        token_response = response.json()
-        
-        access_token = token_response['access_token']
-        expires_in = token_response.get('expires_in', 3600)
-        token_expires = current_time + expires_in - 60  # Refresh 1 minute early
-        
-        print(f"[TOKEN] Access token obtained successfully, expires in {expires_in}s")
-        return access_token
-        
-    except Exception as e:
-        print(f"[ERROR] Failed to get access token: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to get ProKerala access token: {str(e)}")
+    deviations = {}
+    for planet in processed_data.get('rasi_chart', {}).get('planets', []):
+        name = planet['name']
+        if planet.get('longitude') is not None and name in local_longitudes:
+            deviation = abs((planet['longitude'] - local_longitudes[name] + 180) % 360 - 180)
+            deviations[name] = round(deviation, 4)
+    
+    max_deviation = max(deviations.values(), default=0.0)
+    if max_deviation > CROSSCHECK_TOLERANCE:
+        print(f"[CROSSCHECK] Local ephemeris differs from ProKerala by {max_deviation:.3f}° for {params}")
+    return {"max_deviation_deg": max_deviation, "deviations": deviations}
 
 @app.get("/health")
 async def health_check():
@@ -111,52 +309,92 @@ async def health_check():
         "message": "AstroAI FastAPI Backend is running!"
     }
 
+@app.get("/metrics")
+async def metrics():
+    return {
+        "prokerala_token": token_manager.stats(),
+        "kundli_cache": kundli_cache.stats(),
+        "kundli_disk_cache": kundli_disk_cache.stats(),
+        "kundli_coalescing": kundli_flight.stats(),
+        "transits": transit_service.stats(),
+        "dasha_timelines": dasha.timelines.stats(),
+        "timezones": timezones.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/places/search")
+async def search_places(q: str, limit: int = 10):
+    """Place-of-birth autocomplete from the bundled gazetteer"""
+    return {"query": q, "results": gazetteer.search(q, limit=max(1, min(limit, 50)))}
+
+@app.get("/places/nearest")
+async def nearest_place(lat: float, lon: float):
+    """Closest gazetteer place to a coordinate"""
+    place = gazetteer.nearest(lat, lon)
+    if place is None:
+        raise HTTPException(status_code=404, detail="Gazetteer is empty")
+    return place
+
 @app.post("/kundli")
 async def generate_kundli(request: KundliRequest):
-    """Generate kundli using ProKerala API"""
+    """Generate kundli from the local ephemeris or ProKerala API"""
+    unsupported = [d for d in request.divisions or [] if d not in VARGA_NAMES]
+    if unsupported:
+        raise HTTPException(status_code=400, detail=f"Unsupported divisions: {unsupported}")
+    place = resolve_birth_place(request)
+    if request.lat is None or request.lon is None:
+        raise HTTPException(status_code=400, detail=f"Could not find coordinates for '{request.pob}', please provide lat/lon")
+    
+    # The birth time is local to the birth place, with that date's historical offset
+    try:
+        zone = birth_timezone(request, place)
+        birth_iso = timezones.localize(request.dob, request.tob, zone)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     try:
         print(f"[API] Generating kundli for {request.dob} {request.tob} at {request.lat},{request.lon}")
         
-        # Get access token
-        access_token = get_prokerala_access_token()
-        client_id = os.getenv('PROKERALA_CLIENT_ID', '')
-        client_secret = os.getenv('PROKERALA_CLIENT_SECRET', '')
-        
         # Prepare parameters
         params = {
             'ayanamsa': 1,  # Lahiri ayanamsa
             'coordinates': f"{request.lat},{request.lon}",
-            'datetime': f"{request.dob}T{request.tob}:00+00:00"
+            'datetime': birth_iso
         }
         
-        print(f"[API] Calling ProKerala API with params: {params}")
+        # Serve repeat charts from memory without recomputing them
+        cache_key = make_cache_key(params)
+        cached_data = kundli_cache.get(cache_key)
+        if cached_data is None:
+            # Fall back to the on-disk cache shared with other workers
+            cached_data = await run_in_threadpool(kundli_disk_cache.get, cache_key)
+            if cached_data is not None:
+                kundli_cache.set(cache_key, cached_data)
+        if cached_data is not None:
+            print(f"[CACHE] Hit for {cache_key}")
+            return {
+                "data": {
+                    **cached_data,
+                    "birth_details": birth_details(request, zone, birth_iso),
+                    # Transits move on while the chart sits in the cache
+                    "todays_transits": transit_service.transits_for(cached_data.get('planet_positions')),
+                    "current_dasha": current_dasha(cached_data.get('planet_positions'), parse_datetime(birth_iso)),
+                    **requested_vargas(cached_data, request)
+                },
+                "cached": True,
+                "source": cached_data.get('source', "ProKerala API"),
+                "timestamp": datetime.now().isoformat()
+            }
+        
+        client_id = os.getenv('PROKERALA_CLIENT_ID', '')
+        client_secret = os.getenv('PROKERALA_CLIENT_SECRET', '')
         
-        # Make API requests with proper authentication
         try:
-            print(f"[API] Attempting ProKerala API call with Bearer token...")
-            
-            # Make requests with Bearer token
-            headers = {
-                'Authorization': f'Bearer {access_token}',
-                'Content-Type': 'application/json'
-            }
-            
-            # Call kundli endpoint
-            kundli_url = "https://api.prokerala.com/v2/astrology/kundli/advanced"
-            kundli_response = requests.get(kundli_url, params=params, headers=headers)
-            kundli_response.raise_for_status()
-            kundli_data = kundli_response.json()
-            
-            # Call planet position endpoint
-            planet_url = "https://api.prokerala.com/v2/astrology/planet-position"
-            planet_response = requests.get(planet_url, params=params, headers=headers)
-            planet_response.raise_for_status()
-            planet_data = planet_response.json()
-            
-            print(f"[API] ProKerala responses received successfully")
-            
-            # Process the data
-            processed_data = process_real_kundli_data(kundli_data, planet_data, request.dob, request.tob, request.pob)
+            # Identical concurrent requests share one fetch and processing pass
+            processed_data = await kundli_flight.do(
+                cache_key, lambda: build_and_cache_kundli(cache_key, params, request)
+            )
+            processed_data = {**processed_data, "birth_details": birth_details(request, zone, birth_iso)}
             
         except Exception as e:
             error_msg = str(e)
@@ -184,10 +422,13 @@ async def generate_kundli(request: KundliRequest):
                 "message": f"ProKerala API failed: {error_msg}"
             }
         
+        # The cached chart stays division-free, so every combination shares it
+        processed_data = {**processed_data, **requested_vargas(processed_data, request)}
+        
         return {
             "data": processed_data,
             "cached": False,
-            "source": "ProKerala API",
+            "source": processed_data.get('source', "ProKerala API"),
             "timestamp": datetime.now().isoformat()
         }
         
@@ -205,6 +446,95 @@ async def generate_kundli(request: KundliRequest):
             "message": "Failed to fetch kundli data from ProKerala"
         }
 
+@app.post("/kundli/batch")
+async def generate_kundli_batch(request: BatchKundliRequest):
+    """Compute many charts with the local ephemeris and stream them as NDJSON"""
+    if len(request.records) > BATCH_MAX_RECORDS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_RECORDS} records per batch")
+    
+    records = [record.model_dump() for record in request.records]
+    print(f"[BATCH] Computing {len(records)} charts")
+    
+    # A sync generator, so Starlette runs the NumPy work in its threadpool
+    def ndjson_lines():
+        for chart in compute_charts(records):
+            yield json.dumps(chart) + "\n"
+    
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+@app.post("/dasha")
+async def get_dasha(request: DashaRequest):
+    """Vimshottari dasha periods down to the requested depth, optionally within a date range"""
+    place = resolve_birth_place(request) if request.pob else None
+    try:
+        birth = parse_datetime(timezones.localize(request.dob, request.tob, birth_timezone(request, place)))
+        start = parse_datetime(request.start) if request.start else None
+        end = parse_datetime(request.end) if request.end else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid birth details: {str(e)}")
+    
+    moon_longitude = request.moon_longitude
+    if moon_longitude is None:
+        moon_longitude = float(sidereal_longitudes(julian_day(birth))[1])
+    
+    timeline = dasha.get_timeline(moon_longitude, birth)
+    return {
+        "birth_datetime": birth.isoformat(),
+        "moon_longitude": round(moon_longitude, 6),
+        "first_lord": timeline.first_lord,
+        "balance_years": round(timeline.balance_years, 4),
+        "current": timeline.current(datetime.now(timezone.utc), depth=max(request.depth, 1)),
+        "periods": timeline.periods(depth=request.depth, start=start, end=end)
+    }
+
+@app.post("/kundli/match")
+def match_kundlis(request: MatchRequest):
+    """Ashtakoota (guna milan) score one chart against many candidates and rank them"""
+    # Plain def: FastAPI runs it in the threadpool, so scoring never blocks the event loop
+    if len(request.candidates) > MATCH_MAX_CANDIDATES:
+        raise HTTPException(status_code=413, detail=f"At most {MATCH_MAX_CANDIDATES} candidates per match")
+    
+    try:
+        result = rank_matches(
+            request.query.model_dump(),
+            [candidate.model_dump() for candidate in request.candidates],
+            query_role=request.query_role,
+            top_k=max(request.top_k, 1),
+            min_score=request.min_score
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    print(f"[MATCH] Scored {result['scored']} candidates, returning {len(result['matches'])}")
+    return result
+
+@app.post("/muhurat/search")
+def search_muhurat(request: MuhuratRequest):
+    """Find windows in a time range matching the requested tithi/nakshatra/lagna conditions"""
+    # Plain def: FastAPI runs the scan in its threadpool instead of on the event loop
+    try:
+        start, end = parse_datetime(request.start), parse_datetime(request.end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid datetime: {str(e)}")
+    if (end - start).total_seconds() > MUHURAT_MAX_DAYS * 86400:
+        raise HTTPException(status_code=400, detail=f"Search range is limited to {MUHURAT_MAX_DAYS} days")
+    
+    try:
+        windows = muhurat.search(
+            start, end, request.lat, request.lon,
+            tithis=request.tithis,
+            nakshatras=request.nakshatras,
+            lagnas=request.lagnas,
+            exclude_retrograde=request.exclude_retrograde,
+            min_duration_minutes=request.min_duration_minutes,
+            limit=request.limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    print(f"[MUHURAT] {len(windows)} windows between {request.start} and {request.end}")
+    return {"windows": windows, "count": len(windows)}
+
 @app.post("/ask")
 async def ask_question(request: AskRequest):
     """Ask AI question (mock for now)"""
@@ -231,7 +561,7 @@ async def ask_question(request: AskRequest):
         "message": "Mock AI response - add OPENAI_API_KEY to get real answers"
     }
 
-def process_real_kundli_data(kundli_data, planet_data, dob, tob, pob):
+def process_real_kundli_data(kundli_data, planet_data, dob, tob, pob, divisions=None, birth=None):
     """Process real ProKerala API response for your UI"""
     try:
         print(f"[DEBUG] Processing kundli data structure...")
@@ -255,6 +585,12 @@ def process_real_kundli_data(kundli_data, planet_data, dob, tob, pob):
             # Today's transits
             "todays_transits": [],
             
+            # Vimshottari periods running today
+            "current_dasha": [],
+            
+            # Moon rasi and nakshatra, used for matching
+            "moon": {},
+            
             # Birth details
             "birth_details": {
                 "date_of_birth": dob,
@@ -286,6 +622,17 @@ def process_real_kundli_data(kundli_data, planet_data, dob, tob, pob):
                 # Rising sign (Ascendant)
                 if 'zodiac' in nakshatra_details:
                     processed['rising_sign'] = nakshatra_details['zodiac']['name']
+                
+                # Moon rasi and nakshatra (birth star) for kundli matching
+                if 'chandra_rasi' in nakshatra_details and 'nakshatra' in nakshatra_details:
+                    moon_nakshatra = nakshatra_details['nakshatra']
+                    processed['moon'] = {
+                        "rasi": nakshatra_details['chandra_rasi']['name'],
+                        "rasi_id": nakshatra_details['chandra_rasi']['id'],
+                        "nakshatra": moon_nakshatra['name'],
+                        "nakshatra_id": moon_nakshatra['id'],
+                        "pada": moon_nakshatra.get('pada')
+                    }
         
         # Process the Planet data for detailed positions
         if 'data' in planet_data and 'planet_position' in planet_data['data']:
@@ -310,8 +657,10 @@ def process_real_kundli_data(kundli_data, planet_data, dob, tob, pob):
                         'symbol': planet_symbols[planet_name],
                         'sign': planet['rasi']['name'],
                         'degree': f"{planet['degree']:.2f}°",
+                        'longitude': planet.get('longitude'),
                         'house': f"House {planet['position']}",
-                        'nakshatra': 'Unknown',  # Not available in planet-position endpoint
+                        # Not available in planet-position endpoint, only from the local ephemeris
+                        'nakshatra': planet.get('nakshatra', {}).get('name', 'Unknown'),
                         'retrograde': planet['is_retrograde']
                     }
                     
@@ -326,11 +675,14 @@ def process_real_kundli_data(kundli_data, planet_data, dob, tob, pob):
             print(f"[DEBUG] Processed {len(planet_positions)} planets")
             print(f"[DEBUG] Sun: {processed['sun_sign']}, Moon: {processed['moon_sign']}, Rising: {processed['rising_sign']}")
         
-        # Generate mock transits (ProKerala might not provide this)
-        processed['todays_transits'] = [
-            "Moon: Entering Sagittarius",
-            "Mercury: Direct in Capricorn"
-        ]
+        # Today's sky against the natal chart (shared snapshot, cheap per chart)
+        processed['todays_transits'] = transit_service.transits_for(processed['planet_positions'])
+        birth = birth or parse_datetime(f"{dob}T{tob}:00+00:00")
+        processed['current_dasha'] = current_dasha(processed['planet_positions'], birth)
+        
+        # Vargas come from the longitudes we already have, no extra API calls
+        if divisions:
+            processed['divisional_charts'] = divisional_charts(processed['planet_positions'], divisions)
         
         return processed
         
@@ -381,6 +733,7 @@ def generate_rasi_chart_from_planets(planets):
                         "house": house_number,
                         "sign": planet['rasi']['name'],
                         "degree": planet['degree'],
+                        "longitude": planet.get('longitude'),
                         "retrograde": planet['is_retrograde']
                     }
                     rasi_chart["planets"].append(planet_data)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Offline place-of-birth geocoder.
+
+A bundled gazetteer (data/cities.csv: names, coordinates, IANA timezones) is
+loaded once into two in-memory indexes:
+
+- a sorted array of normalized names and alternate names, where every prefix
+  is a contiguous range found by binary search (a flattened trie), for
+  autocomplete and for resolving free-text places of birth;
+- a KD-tree over unit-sphere vectors, for nearest-place lookups.
+
+Usage (replace the bundled list with a GeoNames cities dump):
+    python geocoder.py import cities15000.txt admin1CodesASCII.txt countryInfo.txt [output.csv]
+"""
+
+import csv
+import heapq
+import math
+import os
+import re
+import sys
+import unicodedata
+from bisect import bisect_left
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cities.csv')
+FIELDS = ['name', 'alternate_names', 'admin1', 'country', 'country_code',
+          'latitude', 'longitude', 'timezone', 'population']
+EARTH_RADIUS_KM = 6371.0088
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def normalize(text):
+    """Lowercase ASCII form used for matching: 'São Paulo' -> 'sao paulo'"""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return _NON_ALNUM.sub(' ', text.lower()).strip()
+
+
+def _unit_vector(lat, lon):
+    phi, lam = math.radians(lat), math.radians(lon)
+    return (math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi))
+
+
+class KDTree:
+    """Static 3-d tree stored implicitly: each [lo, hi) slice's median is its node"""
+
+    def __init__(self, points):
+        self.points = points
+        self.index = list(range(len(points)))
+        self._build(0, len(points), 0)
+
+    def _build(self, lo, hi, axis):
+        if hi - lo <= 1:
+            return
+        self.index[lo:hi] = sorted(self.index[lo:hi], key=lambda i: self.points[i][axis])
+        mid = (lo + hi) // 2
+        self._build(lo, mid, (axis + 1) % 3)
+        self._build(mid + 1, hi, (axis + 1) % 3)
+
+    def nearest(self, target):
+        """(index, squared distance) of the point closest to target"""
+        best = [math.inf, -1]
+        points, index = self.points, self.index
+
+        def visit(lo, hi, axis):
+            if lo >= hi:
+                return
+            mid = (lo + hi) // 2
+            point = points[index[mid]]
+            distance = ((point[0] - target[0]) ** 2 + (point[1] - target[1]) ** 2
+                        + (point[2] - target[2]) ** 2)
+            if distance < best[0]:
+                best[0], best[1] = distance, index[mid]
+            diff = target[axis] - point[axis]
+            near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            visit(near[0], near[1], (axis + 1) % 3)
+            if diff * diff < best[0]:
+                visit(far[0], far[1], (axis + 1) % 3)
+
+        visit(0, len(index), 0)
+        return best[1], best[0]
+
+    def within(self, target, radius_squared):
+        """Indexes of all points within sqrt(radius_squared) of target"""
+        found = []
+        points, index = self.points, self.index
+
+        def visit(lo, hi, axis):
+            if lo >= hi:
+                return
+            mid = (lo + hi) // 2
+            point = points[index[mid]]
+            distance = ((point[0] - target[0]) ** 2 + (point[1] - target[1]) ** 2
+                        + (point[2] - target[2]) ** 2)
+            if distance <= radius_squared:
+                found.append(index[mid])
+            diff = target[axis] - point[axis]
+            if diff < 0 or diff * diff <= radius_squared:
+                visit(lo, mid, (axis + 1) % 3)
+            if diff >= 0 or diff * diff <= radius_squared:
+                visit(mid + 1, hi, (axis + 1) % 3)
+
+        visit(0, len(index), 0)
+        return found
+
+
+class Gazetteer:
+    def __init__(self, places):
+        self.places = places
+        # Every name and alternate name of every place, sorted for prefix ranges
+        entries = sorted({(normalize(name), i)
+                          for i, place in enumerate(places)
+                          for name in [place['name']] + place['alternate_names']
+                          if normalize(name)})
+        self._names = [name for name, _ in entries]
+        self._ids = [i for _, i in entries]
+        # Qualifiers a "City, State, Country" string may use
+        self._qualifiers = [{normalize(place['admin1']), normalize(place['country']), place['country_code'].lower()}
+                            for place in places]
+        self._tree = KDTree([_unit_vector(p['latitude'], p['longitude']) for p in places])
+        # Every IANA zone used by each country's places
+        self.country_zones = {}
+        for place in places:
+            self.country_zones.setdefault(place['country_code'], set()).add(place['timezone'])
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        places = []
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                places.append({
+                    "name": row['name'],
+                    "alternate_names": [n for n in row['alternate_names'].split(';') if n],
+                    "admin1": row['admin1'],
+                    "country": row['country'],
+                    "country_code": row['country_code'],
+                    "latitude": float(row['latitude']),
+                    "longitude": float(row['longitude']),
+                    "timezone": row['timezone'],
+                    "population": int(row['population'] or 0),
+                })
+        return cls(places)
+
+    def __len__(self):
+        return len(self.places)
+
+    def _prefix_ids(self, prefix):
+        start = bisect_left(self._names, prefix)
+        end = bisect_left(self._names, prefix + '\x7f', start)
+        return set(self._ids[start:end])
+
+    def _exact_ids(self, name):
+        start = bisect_left(self._names, name)
+        ids = set()
+        while start < len(self._names) and self._names[start] == name:
+            ids.add(self._ids[start])
+            start += 1
+        return ids
+
+    def _qualified(self, ids, qualifiers):
+        """Places whose state/country match every qualifier (prefixes allowed)"""
+        return [i for i in ids
+                if all(any(known.startswith(q) for known in self._qualifiers[i]) for q in qualifiers)]
+
+    def search(self, query, limit=10):
+        """Autocomplete: places whose name starts with the query, most populous first"""
+        parts = [normalize(part) for part in query.split(',')]
+        parts = [part for part in parts if part]
+        if not parts:
+            return []
+        ids = self._qualified(self._prefix_ids(parts[0]), parts[1:])
+        best = heapq.nlargest(limit, ids, key=lambda i: self.places[i]['population'])
+        return [self.to_dict(i) for i in best]
+
+    def resolve(self, pob):
+        """Best place for a free-text place of birth such as 'Mumbai, Maharashtra, India', or None"""
+        parts = [normalize(part) for part in (pob or '').split(',')]
+        parts = [part for part in parts if part]
+        if not parts:
+            return None
+        ids = self._qualified(self._exact_ids(parts[0]), parts[1:])
+        if not ids:
+            return None
+        return self.to_dict(max(ids, key=lambda i: self.places[i]['population']))
+
+    def nearest(self, lat, lon):
+        """Closest known place to a coordinate, with its distance in km"""
+        if not self.places:
+            return None
+        i, chord_squared = self._tree.nearest(_unit_vector(lat, lon))
+        place = self.to_dict(i)
+        place['distance_km'] = round(2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(chord_squared) / 2)), 1)
+        return place
+
+    def zones_within(self, lat, lon, radius_km):
+        """IANA zones of all known places within radius_km of a coordinate"""
+        chord = 2 * math.sin(min(radius_km / (2 * EARTH_RADIUS_KM), math.pi / 2))
+        return {self.places[i]['timezone'] for i in self._tree.within(_unit_vector(lat, lon), chord * chord)}
+
+    def to_dict(self, i):
+        place = self.places[i]
+        parts = [place['name'], place['admin1'] if place['admin1'] != place['name'] else '', place['country']]
+        label = ', '.join(part for part in parts if part)
+        return {
+            "name": place['name'],
+            "label": label,
+            "admin1": place['admin1'],
+            "country": place['country'],
+            "country_code": place['country_code'],
+            "latitude": place['latitude'],
+            "longitude": place['longitude'],
+            "timezone": place['timezone'],
+            "population": place['population'],
+        }
+
+
+def load_gazetteer(path=None):
+    """The bundled gazetteer, or an empty one if the file is missing"""
+    path = path or os.getenv('GAZETTEER_PATH', DEFAULT_PATH)
+    try:
+        gazetteer = Gazetteer.load(path)
+        print(f"[GEOCODER] Loaded {len(gazetteer)} places from {path}")
+        return gazetteer
+    except (OSError, KeyError, ValueError) as e:
+        print(f"[GEOCODER] Could not load gazetteer {path}: {str(e)}")
+        return Gazetteer([])
+
+
+def import_geonames(cities_path, admin1_path, countries_path, output=DEFAULT_PATH):
+    """Convert GeoNames cities/admin1/countryInfo dumps into the gazetteer CSV"""
+    with open(admin1_path, encoding='utf-8') as f:
+        admin1 = dict(line.rstrip('\n').split('\t')[:2] for line in f if '\t' in line)
+    with open(countries_path, encoding='utf-8') as f:
+        countries = {cols[0]: cols[4] for cols in (line.split('\t') for line in f if not line.startswith('#'))
+                     if len(cols) > 4}
+
+    count = 0
+    with open(cities_path, encoding='utf-8') as src, open(output, 'w', newline='', encoding='utf-8') as dst:
+        writer = csv.writer(dst)
+        writer.writerow(FIELDS)
+        for line in src:
+            cols = line.rstrip('\n').split('\t')
+            # ASCII alternate names only, to keep the index compact
+            alternates = [n for n in cols[3].split(',') if n and n.isascii() and n != cols[1]][:5]
+            writer.writerow([
+                cols[1], ';'.join(alternates), admin1.get(f"{cols[8]}.{cols[10]}", ''),
+                countries.get(cols[8], cols[8]), cols[8], cols[4], cols[5], cols[17], cols[14] or 0
+            ])
+            count += 1
+    print(f"✅ Wrote {count} places to {output}")
+
+
+gazetteer = load_gazetteer()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) < 4 or args[0] != 'import':
+        print(__doc__)
+        sys.exit(1)
+    import_geonames(*args[1:5])
@@ -0,0 +1,113 @@
+"""
+Incremental parser for a streamed JSON object.
+
+Chunks of model output are fed in as they arrive; each top-level field of the
+object is reported as soon as its value is complete, so e.g. `shortAnswer` and
+`percentScore` can be forwarded long before the closing brace arrives. Only
+the characters of the current value are buffered, and each character is
+scanned once.
+"""
+
+import json
+
+
+class JSONFieldStream:
+    def __init__(self):
+        self.fields = {}
+        self._started = False
+        self._done = False
+        self._depth = 0          # nesting depth, 1 = inside the top-level object
+        self._in_string = False
+        self._escape = False
+        self._key = None         # key of the value being read at depth 1
+        self._token = []         # characters of the current key or value
+        self._reading = None     # 'key', 'value' or None
+
+    def feed(self, text):
+        """Consume a chunk and return the (name, value) fields it completed"""
+        completed = []
+        for char in text:
+            if self._done:
+                break
+            if not self._started:
+                # Skip anything before the object, such as a ```json fence
+                if char == '{':
+                    self._started = True
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._reading:
+                    self._token.append(char)
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._reading == 'value':
+                        completed.append(self._finish_value())
+                continue
+
+            if self._depth == 1:
+                self._top_level(char, completed)
+            else:
+                self._token.append(char)
+                if char == '"':
+                    self._in_string = True
+                elif char in '{[':
+                    self._depth += 1
+                elif char in '}]':
+                    self._depth -= 1
+                    if self._depth == 1:
+                        completed.append(self._finish_value())
+        return completed
+
+    def _top_level(self, char, completed):
+        if self._reading == 'value':
+            # Bare scalar (number, true, false, null) ends at a delimiter
+            if char in ',}' or char.isspace():
+                completed.append(self._finish_value())
+                if char == '}':
+                    self._done = True
+            else:
+                self._token.append(char)
+            return
+
+        if char == '"':
+            self._in_string = True
+            if self._key is None:
+                self._reading = 'key'
+                self._token = ['"']
+            else:
+                self._reading = 'value'
+                self._token = ['"']
+        elif char == ':' and self._reading == 'key':
+            self._key = json.loads(''.join(self._token))
+            self._reading = None
+            self._token = []
+        elif char in '{[' and self._key is not None:
+            self._reading = 'value'
+            self._token = [char]
+            self._depth += 1
+        elif char == '}':
+            self._done = True
+        elif not char.isspace() and char != ',' and self._key is not None:
+            self._reading = 'value'
+            self._token = [char]
+
+    def _finish_value(self):
+        name = self._key
+        try:
+            value = json.loads(''.join(self._token))
+        except json.JSONDecodeError:
+            value = None
+        self.fields[name] = value
+        self._key = None
+        self._reading = None
+        self._token = []
+        return name, value
+
+    @property
+    def complete(self):
+        return self._done
@@ -0,0 +1,92 @@
+"""
+In-process LRU + TTL cache for processed kundli results.
+
+Charts are deterministic for a given set of ProKerala params, so repeat views
+of the same chart are served from memory instead of spending upstream credits.
+"""
+
+import os
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Bounded mapping with per-entry expiry and least-recently-used eviction"""
+
+    def __init__(self, max_entries=1000, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        value, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        entry = self._data.get(key)
+        return entry is not None and time.monotonic() < entry[1]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def make_cache_key(params):
+    """Build a stable cache key from the ProKerala request params"""
+    normalized = dict(params)
+    coordinates = normalized.get('coordinates')
+    if coordinates:
+        # ~11m precision; finer differences never change a chart
+        lat, lon = (float(v) for v in str(coordinates).split(','))
+        normalized['coordinates'] = f"{lat:.4f},{lon:.4f}"
+    return "|".join(f"{k}={normalized[k]}" for k in sorted(normalized))
+
+
+kundli_cache = TTLCache(
+    max_entries=int(os.getenv('KUNDLI_CACHE_MAX_ENTRIES', 10000)),
+    ttl=int(os.getenv('KUNDLI_CACHE_TTL', 86400)),
+)
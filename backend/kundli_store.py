@@ -0,0 +1,134 @@
+"""
+Firestore-backed kundli cache addressed by deterministic document IDs.
+
+Each cache key maps to the document `kundli_cache/{sha256(cache_key)}`, so a
+lookup is a single document get() instead of an indexed where-query, and
+concurrent writers for the same chart overwrite one document instead of
+adding duplicates.
+
+A local in-memory tier sits in front of Firestore (read-through, write-through)
+and keeps both the decoded document and its prompt fragment, so hot charts
+skip the Firestore round trip on /ask. The fragment is the compact fact sheet
+stored with the document (see fact_sheet.py), built on read for documents
+written before sheets existed, and the serialized payload only when the
+payload has no recognizable chart facts.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from fact_sheet import build_fact_sheet
+from kundli_cache import TTLCache
+
+COLLECTION = 'kundli_cache'
+# Fall back to the old where('cache_key') query for documents written before
+# migrate_kundli_cache.py was run; found documents are moved to their new ID
+LEGACY_LOOKUP = os.getenv('KUNDLI_CACHE_LEGACY_LOOKUP', 'True') == 'True'
+
+
+def cache_doc_id(cache_key):
+    """Document ID for a cache key"""
+    return hashlib.sha256(cache_key.encode('utf-8')).hexdigest()
+
+
+class KundliStore:
+    def __init__(self, db, collection=COLLECTION, local_max_entries=2000, local_ttl=600):
+        self.db = db
+        self.collection = collection
+        # cache_key -> (document dict, fact sheet for prompts)
+        self.local = TTLCache(max_entries=local_max_entries, ttl=local_ttl)
+
+    def _ref(self, cache_key):
+        return self.db.collection(self.collection).document(cache_doc_id(cache_key))
+
+    async def get(self, cache_key):
+        """Return the cached document dict for a key, or None"""
+        entry = await self._get_entry(cache_key)
+        return entry[0] if entry else None
+
+    async def get_prompt_fragment(self, cache_key):
+        """Return the kundli fact sheet for an LLM prompt, or None"""
+        entry = await self._get_entry(cache_key)
+        return entry[1] if entry else None
+
+    async def _get_entry(self, cache_key):
+        entry = self.local.get(cache_key)
+        if entry is not None:
+            return entry
+
+        snapshot = await self._ref(cache_key).get()
+        if snapshot.exists:
+            document = snapshot.to_dict()
+        elif LEGACY_LOOKUP:
+            document = await self._get_legacy(cache_key)
+        else:
+            document = None
+        if document is None:
+            return None
+        return self._remember(cache_key, document)
+
+    def _remember(self, cache_key, document):
+        payload = document.get('payload')
+        fragment = document.get('fact_sheet') or build_fact_sheet(payload) or json.dumps(payload)
+        entry = (document, fragment)
+        self.local.set(cache_key, entry)
+        return entry
+
+    async def get_many(self, cache_keys):
+        """Batch lookup; returns {cache_key: document dict} for the keys found"""
+        found = {}
+        missing = []
+        for key in cache_keys:
+            entry = self.local.get(key)
+            if entry is not None:
+                found[key] = entry[0]
+            else:
+                missing.append(key)
+        if not missing:
+            return found
+
+        keys_by_id = {cache_doc_id(key): key for key in missing}
+        refs = [self.db.collection(self.collection).document(doc_id) for doc_id in keys_by_id]
+        async for snapshot in self.db.get_all(refs):
+            if snapshot.exists:
+                key = keys_by_id[snapshot.id]
+                found[key] = self._remember(key, snapshot.to_dict())[0]
+        if LEGACY_LOOKUP:
+            for key in missing:
+                if key not in found:
+                    document = await self._get_legacy(key)
+                    if document is not None:
+                        found[key] = self._remember(key, document)[0]
+        return found
+
+    async def put(self, cache_key, payload, user_id=None):
+        """Write (or overwrite) the cache entry for a key; returns its document ID"""
+        ref = self._ref(cache_key)
+        document = {
+            'cache_key': cache_key,
+            'payload': payload,
+            # Generated once here so /ask never has to send the raw payload
+            'fact_sheet': build_fact_sheet(payload),
+            'user_id': user_id,
+            'created_at': datetime.now()
+        }
+        await ref.set(document)
+        self._remember(cache_key, document)
+        return ref.id
+
+    def stats(self):
+        return {"local": self.local.stats()}
+
+    async def _get_legacy(self, cache_key):
+        docs = await self.db.collection(self.collection).where('cache_key', '==', cache_key).limit(1).get()
+        if not docs:
+            return None
+        legacy = docs[0]
+        document = legacy.to_dict()
+        # Move it to the deterministic ID so the next lookup is a direct get()
+        await self._ref(cache_key).set(document)
+        await legacy.reference.delete()
+        print(f"[CACHE] Migrated legacy kundli_cache/{legacy.id} to {cache_doc_id(cache_key)}")
+        return document
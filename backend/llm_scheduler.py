@@ -0,0 +1,206 @@
+"""
+Admission control for LLM calls.
+
+Every model call takes a ticket from the scheduler. A ticket is granted when
+a concurrency slot is free and the tokens-per-minute bucket holds its
+estimated tokens, so bursts queue up at the provider's limit instead of all
+hitting it at once and failing with rate-limit errors. Waiting tickets are
+served by priority (staff, then paying users, then free users) and in
+arrival order within a priority. A full queue is refused up front with a
+suggested retry delay, and a ticket that is not granted before its deadline
+gives up.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+
+PRIORITY_STAFF = 0
+PRIORITY_PAID = 1
+PRIORITY_FREE = 2
+
+MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 8))
+TOKENS_PER_MINUTE = int(os.getenv('LLM_TOKENS_PER_MINUTE', 40000))
+MAX_QUEUE = int(os.getenv('LLM_MAX_QUEUE', 100))
+# Seconds from submission until a question is abandoned, queueing included
+DEADLINE = float(os.getenv('LLM_DEADLINE', 60))
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"LLM queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def priority_for(user):
+    """Scheduling priority of a UserResponse"""
+    if user.role in ('admin', 'astrologer'):
+        return PRIORITY_STAFF
+    return PRIORITY_PAID if getattr(user, 'paid', False) else PRIORITY_FREE
+
+
+class Ticket:
+    """One admitted LLM call; use as `async with ticket:` around the call"""
+
+    def __init__(self, scheduler, priority, tokens, deadline):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.tokens = tokens
+        self.deadline = deadline
+        self.submitted_at = time.monotonic()
+        self.granted = asyncio.get_running_loop().create_future()
+        self.state = 'queued'  # queued -> running -> done, or queued -> done
+
+    def remaining(self):
+        """Seconds left before the deadline"""
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def settle(self, actual_tokens):
+        """Return the unused part of the token estimate once real usage is known"""
+        self.scheduler._refund(self.tokens - min(actual_tokens, self.tokens))
+        self.tokens = actual_tokens
+
+    def cancel(self):
+        """Leave the queue or give back the slot; safe to call more than once"""
+        self.scheduler._finish(self)
+
+    async def __aenter__(self):
+        try:
+            await asyncio.wait_for(asyncio.shield(self.granted), self.remaining())
+        except asyncio.TimeoutError:
+            if self.state == 'queued':
+                self.scheduler.timeouts += 1
+            self.cancel()
+            raise DeadlineExceeded(f"Not scheduled within {self.deadline - self.submitted_at:.0f}s")
+        except BaseException:
+            self.cancel()
+            raise
+        return self
+
+    async def __aexit__(self, *exc):
+        self.cancel()
+
+
+class LLMScheduler:
+    def __init__(self, max_concurrency=8, tokens_per_minute=40000, max_queue=100, deadline=60.0):
+        self.max_concurrency = max_concurrency
+        self.tokens_per_minute = tokens_per_minute
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self._refill_rate = tokens_per_minute / 60.0
+        self._bucket = float(tokens_per_minute)
+        self._refilled_at = time.monotonic()
+        self._queue = []  # (priority, sequence, ticket); finished tickets are skipped lazily
+        self._queued = 0
+        self._sequence = itertools.count()
+        self._running = 0
+        self._timer = None
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+
+    def submit(self, priority=PRIORITY_FREE, tokens=1000, deadline=None):
+        """Queue a call estimated at `tokens`; raises QueueFull instead of queueing past max_queue"""
+        if self._queued >= self.max_queue:
+            self.rejected += 1
+            raise QueueFull(self._retry_after())
+        # A call larger than the whole bucket could never start otherwise
+        tokens = min(int(tokens), self.tokens_per_minute)
+        ticket = Ticket(self, priority, tokens, time.monotonic() + (self.deadline if deadline is None else deadline))
+        heapq.heappush(self._queue, (priority, next(self._sequence), ticket))
+        self._queued += 1
+        self._dispatch()
+        return ticket
+
+    def _refill(self):
+        now = time.monotonic()
+        self._bucket = min(self.tokens_per_minute, self._bucket + (now - self._refilled_at) * self._refill_rate)
+        self._refilled_at = now
+
+    def _refund(self, tokens):
+        if tokens > 0:
+            self._refill()
+            self._bucket = min(self.tokens_per_minute, self._bucket + tokens)
+            self._dispatch()
+
+    def _dispatch(self):
+        """Grant queued tickets in priority order while slots and tokens allow"""
+        self._refill()
+        while self._queue and self._running < self.max_concurrency:
+            ticket = self._queue[0][2]
+            if ticket.state != 'queued':
+                heapq.heappop(self._queue)
+                continue
+            if ticket.remaining() <= 0:
+                # Expired while queued (its caller may be gone), never start it
+                heapq.heappop(self._queue)
+                self._finish(ticket)
+                self.timeouts += 1
+                continue
+            if ticket.tokens > self._bucket:
+                # Strict priority: later tickets wait too, and we wake up when the bucket is full enough
+                self._wake_in((ticket.tokens - self._bucket) / self._refill_rate)
+                return
+            heapq.heappop(self._queue)
+            self._queued -= 1
+            self._bucket -= ticket.tokens
+            self._running += 1
+            ticket.state = 'running'
+            self.total_wait += time.monotonic() - ticket.submitted_at
+            ticket.granted.set_result(None)
+
+    def _wake_in(self, seconds):
+        if self._timer is None:
+            def wake():
+                self._timer = None
+                self._dispatch()
+            self._timer = asyncio.get_running_loop().call_later(seconds, wake)
+
+    def _finish(self, ticket):
+        if ticket.state == 'queued':
+            self._queued -= 1
+        elif ticket.state == 'running':
+            self._running -= 1
+            self.completed += 1
+        else:
+            return
+        ticket.state = 'done'
+        self._dispatch()
+
+    def _retry_after(self):
+        """Seconds until the bucket has refilled enough for everything already queued"""
+        self._refill()
+        queued_tokens = sum(t.tokens for _, _, t in self._queue if t.state == 'queued')
+        return max(1, math.ceil((queued_tokens - self._bucket) / self._refill_rate))
+
+    def stats(self):
+        self._refill()
+        granted = self.completed + self._running
+        return {
+            "running": self._running,
+            "queued": self._queued,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "tokens_per_minute": self.tokens_per_minute,
+            "tokens_available": int(self._bucket),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "avg_wait_seconds": round(self.total_wait / granted, 3) if granted else 0.0,
+        }
+
+
+llm_scheduler = LLMScheduler(
+    max_concurrency=MAX_CONCURRENCY,
+    tokens_per_minute=TOKENS_PER_MINUTE,
+    max_queue=MAX_QUEUE,
+    deadline=DEADLINE,
+)
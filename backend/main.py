@@ -3,16 +3,27 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
 from typing import Optional, List
+from contextlib import asynccontextmanager
 import os
 from dotenv import load_dotenv
 import firebase_admin
-from firebase_admin import credentials, firestore, auth
+from firebase_admin import credentials, firestore, firestore_async
 import openai
-import requests
+import httpx
 import json
 from datetime import datetime, timedelta
 import uvicorn
 
+import upstream
+import auth_cache
+from answer_cache import answer_cache, estimate_tokens
+from credits import CreditLedger, InsufficientCredits, CREDIT_SHARDS
+from kundli_store import KundliStore, cache_doc_id
+from geocoder import gazetteer
+from json_stream import JSONFieldStream
+from sse import EventStreamResponse, sse_event
+from llm_scheduler import llm_scheduler, priority_for, QueueFull, DeadlineExceeded
+
 # Load environment variables
 load_dotenv()
 
@@ -34,12 +45,21 @@ if firebase_private_key and not firebase_admin._apps:
 
 # Initialize OpenAI
 openai.api_key = os.getenv("OPENAI_API_KEY")
+ASK_MAX_TOKENS = 1000
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared keep-alive connection pool for ProKerala calls
+    upstream.start()
+    yield
+    await upstream.close()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="AstroAI API",
     description="AI-Powered Astrology Platform Backend",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -53,7 +73,13 @@ app.add_middleware(
 
 # Security
 security = HTTPBearer()
-db = firestore.client()
+db = firestore_async.client()
+kundli_store = KundliStore(
+    db,
+    local_max_entries=int(os.getenv("KUNDLI_LOCAL_CACHE_MAX_ENTRIES", 2000)),
+    local_ttl=int(os.getenv("KUNDLI_LOCAL_CACHE_TTL", 600))
+)
+credit_ledger = CreditLedger(db)
 
 # Pydantic models
 class KundliRequest(BaseModel):
@@ -80,27 +106,40 @@ class UserResponse(BaseModel):
     email: str
     credits: int
     role: str
+    paid: bool = False
+    credit_shards: int = 0
 
 # Authentication dependency
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
-        # Verify Firebase ID token
-        decoded_token = auth.verify_id_token(credentials.credentials)
+        # Verify Firebase ID token (cached until shortly before it expires)
+        decoded_token = await auth_cache.verify_id_token(credentials.credentials)
         uid = decoded_token['uid']
         
+        cached_user = auth_cache.get_user_profile(uid)
+        if cached_user is not None:
+            return cached_user
+        
         # Get user data from Firestore
-        user_doc = db.collection('users').document(uid).get()
+        user_doc = await db.collection('users').document(uid).get()
         if not user_doc.exists:
             raise HTTPException(status_code=404, detail="User not found")
         
         user_data = user_doc.to_dict()
-        return UserResponse(
+        credits = await credit_ledger.balance(uid, user_data)
+        user = UserResponse(
             uid=uid,
             name=user_data.get('name', ''),
             email=user_data.get('email', ''),
-            credits=user_data.get('credits', 0),
-            role=user_data.get('role', 'end_user')
+            credits=credits,
+            role=user_data.get('role', 'end_user'),
+            # Set by the payment webhooks (functions/src/handlers/payment.ts) on every purchase;
+            # firestore.rules keeps clients from writing either field
+            paid=bool(user_data.get('paid') or user_data.get('lastPaymentAt')),
+            credit_shards=user_data.get('credit_shards') or 0
         )
+        auth_cache.set_user_profile(uid, user)
+        return user
     except Exception as e:
         raise HTTPException(status_code=401, detail="Invalid authentication token")
 
@@ -109,6 +148,17 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+@app.get("/metrics")
+async def metrics():
+    return {
+        "kundli_cache": kundli_store.stats(),
+        "auth_cache": auth_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "llm_scheduler": llm_scheduler.stats(),
+        "credits": credit_ledger.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
 # Kundli endpoint
 @app.post("/kundli")
 async def get_kundli(request: KundliRequest, current_user: UserResponse = Depends(get_current_user)):
@@ -116,19 +166,24 @@ async def get_kundli(request: KundliRequest, current_user: UserResponse = Depend
     
     try:
         # Check cache first
-        cache_query = db.collection('kundli_cache').where('cache_key', '==', cache_key).limit(1)
-        cache_docs = cache_query.get()
+        cached_data = await kundli_store.get(cache_key)
         
-        if cache_docs:
-            cached_data = cache_docs[0].to_dict()
+        if cached_data:
             return {
                 "data": cached_data['payload'],
                 "cached": True,
-                "cache_id": cache_docs[0].id
+                "cache_id": cache_doc_id(cache_key),
+                "cache_key": cache_key
             }
         
+        # Resolve coordinates locally so upstream always gets them
+        if request.lat is None or request.lon is None:
+            place = gazetteer.resolve(request.pob)
+            if place is not None:
+                request.lat, request.lon = place['latitude'], place['longitude']
+        
         # Call ProKerala API
-        prokeral_response = requests.post(
+        prokeral_response = await upstream.post(
             f"{os.getenv('PROKERAL_BASE_URL')}/kundli",
             headers={
                 "Authorization": f"Bearer {os.getenv('PROKERAL_API_KEY')}",
@@ -143,21 +198,16 @@ async def get_kundli(request: KundliRequest, current_user: UserResponse = Depend
             }
         )
         
-        if not prokeral_response.ok:
+        if prokeral_response.is_error:
             raise HTTPException(status_code=502, detail="ProKerala API error")
         
         kundli_data = prokeral_response.json()
         
-        # Cache the result
-        cache_ref = db.collection('kundli_cache').add({
-            'cache_key': cache_key,
-            'payload': kundli_data,
-            'user_id': current_user.uid,
-            'created_at': datetime.now()
-        })
+        # Cache the result (deterministic ID, so racing requests share one document)
+        cache_id = await kundli_store.put(cache_key, kundli_data, current_user.uid)
         
         # Update user's birth details
-        db.collection('users').document(current_user.uid).update({
+        await db.collection('users').document(current_user.uid).update({
             'date_of_birth': request.dob,
             'time_of_birth': request.tob,
             'place_of_birth': request.pob,
@@ -169,104 +219,247 @@ async def get_kundli(request: KundliRequest, current_user: UserResponse = Depend
         return {
             "data": kundli_data,
             "cached": False,
-            "cache_id": cache_ref[1].id
+            "cache_id": cache_id,
+            "cache_key": cache_key
         }
         
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=502, detail="External API error")
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal server error")
 
 # Ask question endpoint
+async def build_ask_prompt(request):
+    """Prompt for a question, with the cached kundli facts if a chart was given"""
+    # Get kundli data if provided
+    kundli_facts = ""
+    if request.kundli_cache_key:
+        kundli_facts = await kundli_store.get_prompt_fragment(request.kundli_cache_key) or ""
+    
+    # Create prompt for OpenAI
+    return f"""
+    You are an expert astrologer. Answer the following question based on the provided kundli data and your knowledge of Vedic astrology.
+    
+    KUNDLI FACTS:
+    {kundli_facts or "No kundli data provided"}
+    
+    QUESTION: {request.question}
+    
+    Please provide a detailed astrological analysis including:
+    1. A percentage score (0-100) representing the likelihood/probability
+    2. A brief explanation (2-4 sentences)
+    3. Key astrological factors influencing this
+    4. Practical advice or recommendations
+    
+    Respond in JSON format:
+    {{
+        "shortAnswer": "Brief 2-3 sentence answer",
+        "percentScore": 75,
+        "explanation": "Detailed explanation in 2-4 sentences",
+        "confidenceBreakdown": {{
+            "astrology": 0.45,
+            "knowledge": 0.30,
+            "ai": 0.25
+        }},
+        "sources": [
+            {{
+                "id": "astrology_principle_1",
+                "snippet": "Relevant astrological principle",
+                "source": "Vedic_Astrology"
+            }}
+        ]
+    }}
+    """
+
+def ask_messages(prompt):
+    return [
+        {"role": "system", "content": "You are an expert astrologer. Always respond with valid JSON only."},
+        {"role": "user", "content": prompt}
+    ]
+
+def schedule_ask(prompt, current_user):
+    """Scheduler ticket for one model call; 429 with Retry-After when the queue is full"""
+    try:
+        return llm_scheduler.submit(priority_for(current_user), estimate_tokens(prompt) + ASK_MAX_TOKENS)
+    except QueueFull as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many questions right now, please retry shortly",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+async def reserve_credits(current_user, answer_data):
+    """Reserve the question's credit before answering it; 402 if the balance can't cover it"""
+    # A cache miss costs a credit; a hit only if ANSWER_CACHE_CHARGE says so
+    cost = answer_cache.charge if answer_data is not None else 1
+    try:
+        return await credit_ledger.reserve(current_user, cost)
+    except InsufficientCredits:
+        auth_cache.invalidate_user(current_user.uid)
+        raise HTTPException(status_code=402, detail="Insufficient credits")
+
+async def save_answer(request, current_user, answer_data, reservation, cached=False):
+    """Store the answered question and keep its reserved credit"""
+    # Store question in database
+    question_ref = await db.collection('questions').add({
+        'user_id': current_user.uid,
+        'category': request.category,
+        'question_text': request.question,
+        'answer': answer_data,
+        'kundli_cache_key': request.kundli_cache_key,
+        'cached': cached,
+        'verified': False,
+        'created_at': datetime.now()
+    })
+    
+    await credit_ledger.commit(reservation)
+    auth_cache.invalidate_user(current_user.uid)
+    
+    return {
+        "id": question_ref[1].id,
+        "answer": answer_data,
+        "cached": cached,
+        "credits_remaining": reservation.balance
+    }
+
 @app.post("/ask")
 async def ask_question(request: QuestionRequest, current_user: UserResponse = Depends(get_current_user)):
-    if current_user.credits <= 0:
-        raise HTTPException(status_code=402, detail="Insufficient credits")
+    answer_data = answer_cache.get(request.kundli_cache_key, request.question)
+    reservation = await reserve_credits(current_user, answer_data)
     
     try:
-        # Get kundli data if provided
-        kundli_facts = ""
-        if request.kundli_cache_key:
-            kundli_docs = db.collection('kundli_cache').where('cache_key', '==', request.kundli_cache_key).limit(1).get()
-            if kundli_docs:
-                kundli_facts = json.dumps(kundli_docs[0].to_dict()['payload'])
-        
-        # Create prompt for OpenAI
-        prompt = f"""
-        You are an expert astrologer. Answer the following question based on the provided kundli data and your knowledge of Vedic astrology.
-        
-        KUNDLI DATA:
-        {kundli_facts or "No kundli data provided"}
+        if answer_data is not None:
+            return await save_answer(request, current_user, answer_data, reservation, cached=True)
         
-        QUESTION: {request.question}
+        prompt = await build_ask_prompt(request)
+        ticket = schedule_ask(prompt, current_user)
         
-        Please provide a detailed astrological analysis including:
-        1. A percentage score (0-100) representing the likelihood/probability
-        2. A brief explanation (2-4 sentences)
-        3. Key astrological factors influencing this
-        4. Practical advice or recommendations
-        
-        Respond in JSON format:
-        {{
-            "shortAnswer": "Brief 2-3 sentence answer",
-            "percentScore": 75,
-            "explanation": "Detailed explanation in 2-4 sentences",
-            "confidenceBreakdown": {{
-                "astrology": 0.45,
-                "knowledge": 0.30,
-                "ai": 0.25
-            }},
-            "sources": [
-                {{
-                    "id": "astrology_principle_1",
-                    "snippet": "Relevant astrological principle",
-                    "source": "Vedic_Astrology"
-                }}
-            ]
-        }}
-        """
-        
-        # Call OpenAI
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are an expert astrologer. Always respond with valid JSON only."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=1000
-        )
+        # Call OpenAI once the scheduler has a slot and token budget for it
+        async with ticket:
+            response = await openai.ChatCompletion.acreate(
+                model="gpt-4",
+                messages=ask_messages(prompt),
+                temperature=0.7,
+                max_tokens=ASK_MAX_TOKENS,
+                request_timeout=ticket.remaining()
+            )
+            usage = response.get("usage") or {}
+            if usage.get("total_tokens"):
+                ticket.settle(usage["total_tokens"])
         
         answer_text = response.choices[0].message.content
         answer_data = json.loads(answer_text)
+        answer_cache.set(request.kundli_cache_key, request.question, answer_data,
+                         tokens=usage.get("total_tokens") or estimate_tokens(prompt + answer_text))
         
-        # Store question in database
-        question_ref = db.collection('questions').add({
-            'user_id': current_user.uid,
-            'category': request.category,
-            'question_text': request.question,
-            'answer': answer_data,
-            'kundli_cache_key': request.kundli_cache_key,
-            'verified': False,
-            'created_at': datetime.now()
-        })
-        
-        # Decrement user credits
-        db.collection('users').document(current_user.uid).update({
-            'credits': current_user.credits - 1,
-            'last_question_at': datetime.now()
-        })
-        
-        return {
-            "id": question_ref[1].id,
-            "answer": answer_data,
-            "credits_remaining": current_user.credits - 1
-        }
-        
+        return await save_answer(request, current_user, answer_data, reservation)
+
+    except HTTPException:
+        raise
+    except DeadlineExceeded:
+        raise HTTPException(status_code=504, detail="Timed out waiting for the AI model")
+    except (openai.error.RateLimitError, openai.error.Timeout):
+        raise HTTPException(
+            status_code=429,
+            detail="The AI model is busy, please retry shortly",
+            headers={"Retry-After": "10"}
+        )
     except json.JSONDecodeError:
         raise HTTPException(status_code=500, detail="Failed to parse AI response")
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal server error")
+    finally:
+        # A question that wasn't answered costs nothing
+        await credit_ledger.refund(reservation)
+
+@app.post("/ask/stream")
+async def ask_question_stream(request: QuestionRequest, current_user: UserResponse = Depends(get_current_user)):
+    """
+    Same as /ask, streamed as Server-Sent Events: `token` events carry raw model
+    output, `field` events carry each answer field as soon as it is complete
+    (shortAnswer and percentScore arrive well before the explanation), then
+    `done` or `error`. The credit is reserved up front and refunded unless
+    the stream completes with a valid answer.
+    """
+    hit = answer_cache.get(request.kundli_cache_key, request.question)
+    reservation = await reserve_credits(current_user, hit)
+    if hit is None:
+        # Queue admission is decided before the stream opens, so a full queue is a plain 429
+        try:
+            prompt = await build_ask_prompt(request)
+            ticket = schedule_ask(prompt, current_user)
+        except BaseException:
+            await credit_ledger.refund(reservation)
+            raise
+
+    async def events():
+        # Sent before the model call so the client sees the stream open at once
+        yield sse_event("start", {"question": request.question})
+        if hit is not None:
+            for name, value in hit.items():
+                yield sse_event("field", {"name": name, "value": value})
+            yield sse_event("done", await save_answer(request, current_user, hit, reservation, cached=True))
+            return
+
+        parser = JSONFieldStream()
+        chunks = []
+        try:
+            async with ticket:
+                stream = await openai.ChatCompletion.acreate(
+                    model="gpt-4",
+                    messages=ask_messages(prompt),
+                    temperature=0.7,
+                    max_tokens=ASK_MAX_TOKENS,
+                    request_timeout=ticket.remaining(),
+                    stream=True
+                )
+                async for chunk in stream:
+                    text = chunk["choices"][0]["delta"].get("content", "")
+                    if not text:
+                        continue
+                    chunks.append(text)
+                    yield sse_event("token", {"text": text})
+                    for name, value in parser.feed(text):
+                        yield sse_event("field", {"name": name, "value": value})
+                ticket.settle(estimate_tokens(prompt + ''.join(chunks)))
+
+            answer_text = ''.join(chunks)
+            answer_data = json.loads(answer_text)
+            # Streamed completions carry no usage data
+            answer_cache.set(request.kundli_cache_key, request.question, answer_data,
+                             tokens=estimate_tokens(prompt + answer_text))
+            result = await save_answer(request, current_user, answer_data, reservation)
+            yield sse_event("done", result)
+        except DeadlineExceeded:
+            yield sse_event("error", {"detail": "Timed out waiting for the AI model"})
+        except (openai.error.RateLimitError, openai.error.Timeout):
+            yield sse_event("error", {"detail": "The AI model is busy, please retry shortly", "retry_after": 10})
+        except json.JSONDecodeError:
+            yield sse_event("error", {"detail": "Failed to parse AI response"})
+        except Exception as e:
+            print(f"[ASK] Stream failed for {current_user.uid}: {str(e)}")
+            yield sse_event("error", {"detail": "Internal server error"})
+
+    async def release():
+        # Runs even if the client left before events() started, so the
+        # scheduler slot is never held forever and nobody is charged for an
+        # answer they never got (a no-op once save_answer committed it)
+        if hit is None:
+            ticket.cancel()
+        await credit_ledger.refund(reservation)
+
+    return EventStreamResponse(events(), on_close=release)
+
+# Move a high-volume user's credits to sharded counters
+@app.post("/admin/users/{uid}/credit-shards")
+async def shard_user_credits(uid: str, shards: int = CREDIT_SHARDS, current_user: UserResponse = Depends(get_current_user)):
+    if current_user.role != 'admin':
+        raise HTTPException(status_code=403, detail="Admin only")
+    if not 1 <= shards <= 100:
+        raise HTTPException(status_code=400, detail="shards must be between 1 and 100")
+    shards = await credit_ledger.shard_user(uid, shards)
+    auth_cache.invalidate_user(uid)
+    return {"uid": uid, "credit_shards": shards}
 
 # Payment endpoints
 @app.post("/payment/create-order")
@@ -287,7 +480,7 @@ async def create_payment_order(request: PaymentRequest, current_user: UserRespon
             })
             
             # Store payment record
-            payment_ref = db.collection('payments').add({
+            payment_ref = await db.collection('payments').add({
                 'user_id': current_user.uid,
                 'amount': request.amount,
                 'currency': request.currency,
@@ -332,7 +525,7 @@ async def create_payment_order(request: PaymentRequest, current_user: UserRespon
             )
             
             # Store payment record
-            payment_ref = db.collection('payments').add({
+            payment_ref = await db.collection('payments').add({
                 'user_id': current_user.uid,
                 'amount': request.amount,
                 'currency': request.currency,
@@ -365,7 +558,7 @@ async def get_user_questions(limit: int = 10, current_user: UserResponse = Depen
             .limit(limit)
         
         questions = []
-        for doc in questions_query.stream():
+        async for doc in questions_query.stream():
             question_data = doc.to_dict()
             questions.append({
                 "id": doc.id,
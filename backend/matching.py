@@ -0,0 +1,197 @@
+"""
+Ashtakoota (guna milan) compatibility scoring.
+
+Four kootas depend only on the pair of Moon rasis and four only on the pair of
+Moon nakshatras, so all eight are precomputed at import into 12x12 and 27x27
+tables indexed [groom, bride]. Scoring one chart against N candidates is then
+a fancy-indexing lookup per table and a top-k partition, with no per-candidate
+Python work until the winners are formatted.
+"""
+
+import numpy as np
+
+from ephemeris import RASI_NAMES, NAKSHATRA_NAMES
+
+KOOTAS = ['varna', 'vashya', 'tara', 'yoni', 'graha_maitri', 'gana', 'bhakoot', 'nadi']
+MAX_POINTS = {'varna': 1, 'vashya': 2, 'tara': 3, 'yoni': 4, 'graha_maitri': 5, 'gana': 6, 'bhakoot': 7, 'nadi': 8}
+TOTAL_POINTS = 36
+
+# Varna by rasi: 0 Shudra, 1 Vaishya, 2 Kshatriya, 3 Brahmin
+_VARNA = [2, 1, 0, 3, 2, 1, 0, 3, 2, 1, 0, 3]
+
+# Vashya by rasi: 0 Chatushpada, 1 Manava, 2 Jalachara, 3 Vanachara, 4 Keeta
+_VASHYA = [0, 0, 1, 2, 3, 1, 1, 4, 1, 0, 1, 2]
+_VASHYA_SCORES = [
+    [2, 1, 1, 0.5, 1],
+    [1, 2, 0.5, 0, 1],
+    [1, 0.5, 2, 1, 1],
+    [0.5, 0, 1, 2, 0],
+    [1, 1, 1, 0, 2],
+]
+
+# Rasi lords and natural friendships: 1 friend, 0 neutral, -1 enemy
+_LORDS = ['Mars', 'Venus', 'Mercury', 'Moon', 'Sun', 'Mercury',
+          'Venus', 'Mars', 'Jupiter', 'Saturn', 'Saturn', 'Jupiter']
+_FRIENDSHIP = {
+    'Sun': {'Moon': 1, 'Mars': 1, 'Jupiter': 1, 'Mercury': 0, 'Venus': -1, 'Saturn': -1},
+    'Moon': {'Sun': 1, 'Mercury': 1, 'Mars': 0, 'Jupiter': 0, 'Venus': 0, 'Saturn': 0},
+    'Mars': {'Sun': 1, 'Moon': 1, 'Jupiter': 1, 'Venus': 0, 'Saturn': 0, 'Mercury': -1},
+    'Mercury': {'Sun': 1, 'Venus': 1, 'Mars': 0, 'Jupiter': 0, 'Saturn': 0, 'Moon': -1},
+    'Jupiter': {'Sun': 1, 'Moon': 1, 'Mars': 1, 'Saturn': 0, 'Mercury': -1, 'Venus': -1},
+    'Venus': {'Mercury': 1, 'Saturn': 1, 'Mars': 0, 'Jupiter': 0, 'Sun': -1, 'Moon': -1},
+    'Saturn': {'Mercury': 1, 'Venus': 1, 'Jupiter': 0, 'Sun': -1, 'Moon': -1, 'Mars': -1},
+}
+# Graha maitri points by the sorted pair of each lord's attitude to the other
+_MAITRI_SCORES = {(1, 1): 5, (0, 1): 4, (0, 0): 3, (-1, 1): 1, (-1, 0): 0.5, (-1, -1): 0}
+
+# Yoni animal by nakshatra, and points by [groom animal, bride animal]
+_YONI_ANIMALS = ['Horse', 'Elephant', 'Sheep', 'Serpent', 'Dog', 'Cat', 'Rat',
+                 'Cow', 'Buffalo', 'Tiger', 'Deer', 'Monkey', 'Mongoose', 'Lion']
+_YONI = [0, 1, 2, 3, 3, 4, 5, 2, 5, 6, 6, 7, 8, 9, 8, 9, 10, 10, 4, 11, 12, 11, 13, 0, 13, 7, 1]
+_YONI_SCORES = [
+    [4, 2, 2, 3, 2, 2, 2, 1, 0, 1, 3, 3, 2, 1],
+    [2, 4, 3, 3, 2, 2, 2, 2, 3, 1, 2, 3, 2, 0],
+    [2, 3, 4, 2, 1, 2, 1, 3, 3, 1, 2, 0, 3, 1],
+    [3, 3, 2, 4, 2, 1, 1, 1, 1, 2, 2, 2, 0, 2],
+    [2, 2, 1, 2, 4, 2, 1, 2, 2, 1, 0, 2, 1, 1],
+    [2, 2, 2, 1, 2, 4, 0, 2, 2, 1, 3, 3, 2, 1],
+    [2, 2, 1, 1, 1, 0, 4, 2, 2, 2, 2, 2, 1, 2],
+    [1, 2, 3, 1, 2, 2, 2, 4, 3, 0, 3, 2, 2, 1],
+    [0, 3, 3, 1, 2, 2, 2, 3, 4, 1, 2, 2, 2, 1],
+    [1, 1, 1, 2, 1, 1, 2, 0, 1, 4, 1, 1, 2, 1],
+    [3, 2, 2, 2, 0, 3, 2, 3, 2, 1, 4, 2, 2, 1],
+    [3, 3, 0, 2, 2, 3, 2, 2, 2, 1, 2, 4, 3, 2],
+    [2, 2, 3, 0, 1, 2, 1, 2, 2, 2, 2, 3, 4, 2],
+    [1, 0, 1, 2, 1, 1, 2, 1, 1, 1, 1, 2, 2, 4],
+]
+
+# Gana by nakshatra: 0 Deva, 1 Manushya, 2 Rakshasa; points by [groom, bride]
+_GANA = [0, 1, 2, 1, 0, 1, 0, 0, 2, 2, 1, 1, 0, 2, 0, 2, 0, 2, 2, 1, 1, 0, 2, 2, 1, 1, 0]
+_GANA_SCORES = [
+    [6, 6, 1],
+    [5, 6, 0],
+    [1, 0, 6],
+]
+
+# Nadi by nakshatra (Adi, Madhya, Antya zig-zag)
+_NADI = [[0, 1, 2, 2, 1, 0][i % 6] for i in range(27)]
+
+
+def _build_rasi_table():
+    """(4, 12, 12) points for varna, vashya, graha maitri and bhakoot"""
+    table = np.zeros((4, 12, 12))
+    for groom in range(12):
+        for bride in range(12):
+            table[0, groom, bride] = 1 if _VARNA[groom] >= _VARNA[bride] else 0
+            table[1, groom, bride] = _VASHYA_SCORES[_VASHYA[groom]][_VASHYA[bride]]
+            lord_g, lord_b = _LORDS[groom], _LORDS[bride]
+            if lord_g == lord_b:
+                table[2, groom, bride] = 5
+            else:
+                pair = tuple(sorted((_FRIENDSHIP[lord_g][lord_b], _FRIENDSHIP[lord_b][lord_g])))
+                table[2, groom, bride] = _MAITRI_SCORES[pair]
+            # 2/12, 5/9 and 6/8 placements from each other are bhakoot dosha
+            distance = (groom - bride) % 12 + 1
+            table[3, groom, bride] = 0 if distance in (2, 12, 5, 9, 6, 8) else 7
+    return table
+
+
+def _build_nakshatra_table():
+    """(4, 27, 27) points for tara, yoni, gana and nadi"""
+    table = np.zeros((4, 27, 27))
+    for groom in range(27):
+        for bride in range(27):
+            # Counted both ways; the 3rd, 5th and 7th taras are inauspicious
+            tara = sum(1.5 for count in ((groom - bride) % 27 + 1, (bride - groom) % 27 + 1)
+                       if count % 9 not in (3, 5, 7))
+            table[0, groom, bride] = tara
+            table[1, groom, bride] = _YONI_SCORES[_YONI[groom]][_YONI[bride]]
+            table[2, groom, bride] = _GANA_SCORES[_GANA[groom]][_GANA[bride]]
+            table[3, groom, bride] = 0 if _NADI[groom] == _NADI[bride] else 8
+    return table
+
+
+RASI_TABLE = _build_rasi_table()
+NAKSHATRA_TABLE = _build_nakshatra_table()
+# Row order of the stacked rasi and nakshatra tables within KOOTAS
+_RASI_KOOTAS = [KOOTAS.index(k) for k in ('varna', 'vashya', 'graha_maitri', 'bhakoot')]
+_NAKSHATRA_KOOTAS = [KOOTAS.index(k) for k in ('tara', 'yoni', 'gana', 'nadi')]
+_RASI_INDEX = {name: i for i, name in enumerate(RASI_NAMES)}
+_NAKSHATRA_INDEX = {name: i for i, name in enumerate(NAKSHATRA_NAMES)}
+
+
+def _index(value, names, kind):
+    """Accept a 0-based id or a name"""
+    if isinstance(value, str):
+        if value not in names:
+            raise ValueError(f"Unknown {kind}: {value}")
+        return names[value]
+    index = int(value)
+    if not 0 <= index < len(names):
+        raise ValueError(f"{kind} id out of range: {value}")
+    return index
+
+
+def moon_indices(chart):
+    """(rasi, nakshatra) indices of a chart dict with moon_rasi and moon_nakshatra"""
+    return (_index(chart['moon_rasi'], _RASI_INDEX, 'rasi'),
+            _index(chart['moon_nakshatra'], _NAKSHATRA_INDEX, 'nakshatra'))
+
+
+def koota_scores(groom_rasi, groom_nakshatra, bride_rasi, bride_nakshatra):
+    """Points for each koota, shape (8,) + broadcast shape of the inputs"""
+    rasi_points = RASI_TABLE[:, groom_rasi, bride_rasi]
+    nakshatra_points = NAKSHATRA_TABLE[:, groom_nakshatra, bride_nakshatra]
+    scores = np.empty((len(KOOTAS),) + rasi_points.shape[1:])
+    scores[_RASI_KOOTAS] = rasi_points
+    scores[_NAKSHATRA_KOOTAS] = nakshatra_points
+    return scores
+
+
+def rank_matches(query, candidates, query_role='groom', top_k=10, min_score=0):
+    """
+    Score one chart against many candidates and return the best top_k.
+
+    query and candidates are dicts with moon_rasi and moon_nakshatra (names or
+    0-based ids) and, for candidates, an optional id. query_role says whether
+    the query chart is the groom's or the bride's.
+    """
+    if query_role not in ('groom', 'bride'):
+        raise ValueError("query_role must be 'groom' or 'bride'")
+    query_rasi, query_nakshatra = moon_indices(query)
+
+    rows, errors = [], []
+    for i, candidate in enumerate(candidates):
+        try:
+            rows.append((i,) + moon_indices(candidate))
+        except (KeyError, TypeError, ValueError) as e:
+            errors.append({"id": candidate.get('id'), "index": i, "error": str(e)})
+    if not rows:
+        return {"matches": [], "scored": 0, "errors": errors}
+
+    index, rasi, nakshatra = (np.array(column) for column in zip(*rows))
+    if query_role == 'groom':
+        scores = koota_scores(query_rasi, query_nakshatra, rasi, nakshatra)
+    else:
+        scores = koota_scores(rasi, nakshatra, query_rasi, query_nakshatra)
+    totals = scores.sum(axis=0)
+
+    eligible = np.nonzero(totals >= min_score)[0]
+    if len(eligible) > top_k:
+        eligible = eligible[np.argpartition(-totals[eligible], top_k - 1)[:top_k]]
+    # Highest total first, ties in input order
+    best = eligible[np.lexsort((index[eligible], -totals[eligible]))]
+
+    matches = []
+    for n in best:
+        candidate = candidates[index[n]]
+        breakdown = {koota: float(scores[k, n]) for k, koota in enumerate(KOOTAS)}
+        matches.append({
+            "id": candidate.get('id'),
+            "total": float(totals[n]),
+            "max_total": TOTAL_POINTS,
+            "kootas": breakdown,
+            "nadi_dosha": breakdown['nadi'] == 0,
+            "bhakoot_dosha": breakdown['bhakoot'] == 0,
+        })
+    return {"matches": matches, "scored": len(rows), "errors": errors}
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Move kundli_cache documents to deterministic document IDs.
+
+Older versions of the backend wrote cache entries with auto-generated IDs via
+.add(), and racing requests could leave several documents for one cache key.
+This script rewrites every entry to kundli_cache/{sha256(cache_key)} (keeping
+the newest duplicate) and deletes the old documents.
+
+Usage:
+    python migrate_kundli_cache.py            # migrate
+    python migrate_kundli_cache.py --dry-run  # only report what would change
+"""
+
+import os
+import sys
+
+from dotenv import load_dotenv
+import firebase_admin
+from firebase_admin import credentials, firestore
+
+from kundli_store import COLLECTION, cache_doc_id
+
+BATCH_SIZE = 400  # Firestore allows 500 writes per batch
+
+
+def init_firestore():
+    load_dotenv()
+    firebase_private_key = os.getenv("FIREBASE_PRIVATE_KEY")
+    if not firebase_private_key:
+        print("❌ FIREBASE_PRIVATE_KEY is not set")
+        sys.exit(1)
+    if not firebase_admin._apps:
+        cred = credentials.Certificate({
+            "type": "service_account",
+            "project_id": os.getenv("FIREBASE_PROJECT_ID"),
+            "private_key_id": os.getenv("FIREBASE_PRIVATE_KEY_ID"),
+            "private_key": firebase_private_key.replace('\\n', '\n'),
+            "client_email": os.getenv("FIREBASE_CLIENT_EMAIL"),
+            "client_id": os.getenv("FIREBASE_CLIENT_ID"),
+            "auth_uri": os.getenv("FIREBASE_AUTH_URI"),
+            "token_uri": os.getenv("FIREBASE_TOKEN_URI"),
+        })
+        firebase_admin.initialize_app(cred)
+    return firestore.client()
+
+
+def created_at_key(document):
+    created_at = document.get('created_at')
+    return created_at.timestamp() if created_at else 0
+
+
+def main():
+    dry_run = '--dry-run' in sys.argv
+    db = init_firestore()
+    collection = db.collection(COLLECTION)
+
+    # Group every legacy document by the ID it should live at
+    groups = {}
+    for snapshot in collection.stream():
+        document = snapshot.to_dict()
+        cache_key = document.get('cache_key')
+        if not cache_key:
+            print(f"⚠️  Skipping {snapshot.id}: no cache_key")
+            continue
+        groups.setdefault(cache_doc_id(cache_key), []).append((snapshot, document))
+
+    batch = db.batch()
+    pending = 0
+    moved = 0
+    deleted = 0
+    for doc_id, entries in groups.items():
+        legacy = [(s, d) for s, d in entries if s.id != doc_id]
+        if not legacy:
+            continue
+
+        # Keep the newest document, whether it is already migrated or not
+        _, newest = max(entries, key=lambda entry: created_at_key(entry[1]))
+        print(f"{'[dry-run] ' if dry_run else ''}{newest['cache_key']} -> {doc_id} ({len(legacy)} legacy)")
+        if dry_run:
+            continue
+
+        batch.set(collection.document(doc_id), newest)
+        pending += 1
+        moved += 1
+        for snapshot, _ in legacy:
+            batch.delete(snapshot.reference)
+            pending += 1
+            deleted += 1
+        if pending >= BATCH_SIZE:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        batch.commit()
+
+    print(f"✅ {len(groups)} cache keys, {moved} migrated, {deleted} legacy documents deleted")
+    if not dry_run:
+        print("Set KUNDLI_CACHE_LEGACY_LOOKUP=False once every instance runs the new backend.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Muhurat (auspicious window) search.
+
+A time range is scanned on a coarse grid where every condition (tithi,
+nakshatra, lagna, retrograde exclusions) is evaluated for all samples at once.
+Only the grid intervals where the result flips are then refined, again in
+vectorized bisection passes, down to one-minute resolution. A failing stretch
+shorter than the grid step can hide between two passing samples (a 13-minute
+lagna at high latitudes, say); it always changes some condition's value, so
+passing intervals whose tithi, nakshatra, lagna or retrograde state differs
+at the two ends are also sampled minute by minute. A 90-day scan is a few
+thousand samples plus a few bisection rounds rather than 130k per-minute
+evaluations.
+"""
+
+from datetime import timedelta, timezone
+
+import numpy as np
+
+from ephemeris import (
+    PLANETS, RASI_NAMES, NAKSHATRA_NAMES, NAKSHATRA_SPAN,
+    julian_day, sidereal_longitudes, daily_speeds, ascendant
+)
+
+# Coarse grid step. Single conditions usually last far longer (lagnas ~1.5h+
+# away from the poles, tithis and nakshatras ~19h+), but their overlap can be
+# short, so search() never uses a step longer than min_duration_minutes: any
+# window at least that long then contains a grid point and cannot be skipped
+COARSE_STEP_MINUTES = 15
+MINUTE = 1.0 / 1440
+
+TITHI_NAMES = [
+    'Pratipada', 'Dwitiya', 'Tritiya', 'Chaturthi', 'Panchami', 'Shashthi', 'Saptami', 'Ashtami',
+    'Navami', 'Dashami', 'Ekadashi', 'Dwadashi', 'Trayodashi', 'Chaturdashi'
+]
+
+
+def tithi_name(tithi):
+    """Name of a tithi number 1-30 (Shukla 1-15, Krishna 16-30)"""
+    if tithi == 15:
+        return 'Shukla Purnima'
+    if tithi == 30:
+        return 'Krishna Amavasya'
+    paksha = 'Shukla' if tithi < 15 else 'Krishna'
+    return f"{paksha} {TITHI_NAMES[(tithi - 1) % 15]}"
+
+
+def _index_of(names, values, kind):
+    indices = []
+    for value in values:
+        if value not in names:
+            raise ValueError(f"Unknown {kind}: {value}")
+        indices.append(names.index(value))
+    return indices
+
+
+class Conditions:
+    """Compiled search conditions, evaluated over arrays of Julian days"""
+
+    def __init__(self, lat, lon, tithis=None, nakshatras=None, lagnas=None, exclude_retrograde=()):
+        self.lat = lat
+        self.lon = lon
+        self.tithis = np.array(sorted(set(tithis)), dtype=int) if tithis else None
+        if self.tithis is not None and (self.tithis.min() < 1 or self.tithis.max() > 30):
+            raise ValueError("Tithis must be between 1 and 30")
+        self.nakshatras = np.array(_index_of(NAKSHATRA_NAMES, nakshatras, 'nakshatra')) if nakshatras else None
+        self.lagnas = np.array(_index_of(RASI_NAMES, lagnas, 'lagna')) if lagnas else None
+        self.retrograde = _index_of(PLANETS, exclude_retrograde or (), 'planet')
+
+    def panchang(self, jd):
+        """Tithi (1-30), nakshatra index and lagna index for each jd"""
+        longitudes = sidereal_longitudes(jd)
+        sun, moon = longitudes[0], longitudes[1]
+        tithi = (np.mod(moon - sun, 360.0) // 12).astype(int) + 1
+        nakshatra = (moon // NAKSHATRA_SPAN).astype(int) % 27
+        lagna = (ascendant(jd, self.lat, self.lon) // 30).astype(int) % 12
+        return tithi, nakshatra, lagna
+
+    def evaluate(self, jd):
+        """Boolean mask of the samples that satisfy every condition"""
+        return self.evaluate_with_state(jd)[0]
+
+    def evaluate_with_state(self, jd):
+        """The mask plus the values the conditions depend on, shaped (values, len(jd))"""
+        tithi, nakshatra, lagna = self.panchang(jd)
+        ok = np.ones(np.shape(jd), dtype=bool)
+        values = []
+        if self.tithis is not None:
+            ok &= np.isin(tithi, self.tithis)
+            values.append(tithi)
+        if self.nakshatras is not None:
+            ok &= np.isin(nakshatra, self.nakshatras)
+            values.append(nakshatra)
+        if self.lagnas is not None:
+            ok &= np.isin(lagna, self.lagnas)
+            values.append(lagna)
+        if self.retrograde:
+            speeds = daily_speeds(jd)
+            for p in self.retrograde:
+                direct = speeds[p] >= 0
+                ok &= direct
+                values.append(direct)
+        return ok, np.array(values) if values else np.empty((0,) + np.shape(jd))
+
+
+def _refine(conditions, lo, hi, state_lo):
+    """Vectorized bisection: first minute in each (lo, hi] where the state flips"""
+    while np.any(hi - lo > MINUTE):
+        mid = (lo + hi) / 2
+        same = conditions.evaluate(mid) == state_lo
+        lo = np.where(same, mid, lo)
+        hi = np.where(same, hi, mid)
+    return hi
+
+
+def search(start, end, lat, lon, tithis=None, nakshatras=None, lagnas=None,
+           exclude_retrograde=('Mercury',), min_duration_minutes=30, limit=10):
+    """
+    Find windows in [start, end) where all conditions hold.
+
+    start and end are timezone-aware datetimes; windows are returned in the
+    start's timezone, longest first.
+    """
+    if end <= start:
+        raise ValueError("end must be after start")
+    if min_duration_minutes < 1:
+        raise ValueError("min_duration_minutes must be at least 1")
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    conditions = Conditions(lat, lon, tithis, nakshatras, lagnas, exclude_retrograde)
+
+    jd_start, jd_end = julian_day(start), julian_day(end)
+    step = min(COARSE_STEP_MINUTES, min_duration_minutes) * MINUTE
+    grid = np.append(np.arange(jd_start, jd_end, step), jd_end)
+    ok, state = conditions.evaluate_with_state(grid)
+
+    # Sample passing intervals where some value changes minute by minute, so
+    # a shorter failing stretch inside them is not merged into one window
+    hidden = np.nonzero(ok[1:] & ok[:-1] & np.any(state[:, 1:] != state[:, :-1], axis=0))[0]
+    per_step = int(round(step / MINUTE))
+    if len(hidden) and per_step > 1:
+        inner = grid[hidden][:, np.newaxis] + MINUTE * np.arange(1, per_step)
+        inner = inner[inner < grid[hidden + 1][:, np.newaxis]]
+        grid = np.concatenate([grid, inner])
+        ok = np.concatenate([ok, conditions.evaluate(inner)])
+        order = np.argsort(grid, kind='stable')
+        grid, ok = grid[order], ok[order]
+
+    # Refine every interval whose endpoints disagree
+    flips = np.nonzero(ok[1:] != ok[:-1])[0]
+    edges = _refine(conditions, grid[flips], grid[flips + 1], ok[flips]) if len(flips) else np.array([])
+
+    # Walk the edges to build [begin, finish) runs where ok is True
+    windows = []
+    begin = jd_start if ok[0] else None
+    for edge, rising in zip(edges, ~ok[flips]):
+        if rising:
+            begin = edge
+        elif begin is not None:
+            windows.append((begin, edge))
+            begin = None
+    if begin is not None:
+        windows.append((begin, jd_end))
+
+    min_days = min_duration_minutes * MINUTE
+    windows = [(b, f) for b, f in windows if f - b >= min_days - 1e-9]
+    windows.sort(key=lambda w: (-(w[1] - w[0]), w[0]))
+    windows = windows[:limit]
+    if not windows:
+        return []
+
+    # Describe each window by the panchang at its midpoint
+    midpoints = np.array([(b + f) / 2 for b, f in windows])
+    tithi, nakshatra, lagna = conditions.panchang(midpoints)
+    output_tz = start.tzinfo or timezone.utc
+
+    def to_datetime(jd):
+        minutes = round((jd - jd_start) * 1440)
+        return (start + timedelta(minutes=minutes)).astimezone(output_tz)
+
+    results = []
+    for i, (b, f) in enumerate(windows):
+        results.append({
+            "start": to_datetime(b).isoformat(),
+            "end": to_datetime(f).isoformat(),
+            "duration_minutes": int(round((f - b) * 1440)),
+            "tithi": tithi_name(int(tithi[i])),
+            "nakshatra": NAKSHATRA_NAMES[int(nakshatra[i])],
+            # Lagna changes every ~2h, so long windows may span several
+            "lagna_at_midpoint": RASI_NAMES[int(lagna[i])],
+        })
+    return results
@@ -0,0 +1,160 @@
+"""
+ProKerala OAuth token manager.
+
+Keeps one client-credentials access token per process. Concurrent callers that
+find the token missing or expired share a single in-flight refresh, and a
+background task renews the token shortly before it expires so user requests
+normally never wait on /token.
+"""
+
+import asyncio
+import os
+import time
+
+import upstream
+
+TOKEN_URL = "https://api.prokerala.com/token"
+# Stop handing out a token this many seconds before it really expires
+EXPIRY_MARGIN = 60
+# Background renewal starts this many seconds before expiry
+RENEW_AHEAD = int(os.getenv('PROKERALA_TOKEN_RENEW_AHEAD', 300))
+# Delay before the background task retries a failed renewal
+RETRY_DELAY = 30
+
+
+class TokenRefreshError(Exception):
+    pass
+
+
+def load_credentials():
+    """Read ProKerala client credentials from the environment or config.txt"""
+    client_id = os.getenv('PROKERALA_CLIENT_ID')
+    client_secret = os.getenv('PROKERALA_CLIENT_SECRET')
+
+    # Fallback to config file
+    if not client_id or not client_secret:
+        print("[CREDENTIALS] Environment variables not found, checking config.txt...")
+        try:
+            with open('config.txt', 'r') as f:
+                for line in f.read().strip().split('\n'):
+                    if line.startswith('PROKERALA_CLIENT_ID='):
+                        client_id = line.split('=', 1)[1].strip()
+                    elif line.startswith('PROKERALA_CLIENT_SECRET='):
+                        client_secret = line.split('=', 1)[1].strip()
+        except OSError:
+            pass
+
+    return client_id, client_secret
+
+
+class TokenManager:
+    def __init__(self):
+        self.access_token = None
+        self.fetched_at = 0.0
+        self.expires_at = 0.0
+        self.refresh_count = 0
+        self.refresh_failures = 0
+        self.background_refreshes = 0
+        self.coalesced_waits = 0
+        self._refresh_task = None
+        self._renew_task = None
+
+    def _is_valid(self):
+        return self.access_token is not None and time.time() < self.expires_at - EXPIRY_MARGIN
+
+    async def get_token(self):
+        """Return a valid access token, joining any refresh already in flight"""
+        if self._is_valid():
+            return self.access_token
+        return await self.refresh()
+
+    async def refresh(self):
+        """Fetch a new token; concurrent callers share one request"""
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._fetch_token())
+            self._refresh_task.add_done_callback(self._clear_refresh_task)
+        else:
+            self.coalesced_waits += 1
+        # shield() so one cancelled caller does not cancel the shared refresh
+        return await asyncio.shield(self._refresh_task)
+
+    def _clear_refresh_task(self, task):
+        self._refresh_task = None
+        # Retrieve the exception so a refresh nobody awaited does not warn
+        if not task.cancelled():
+            task.exception()
+
+    async def _fetch_token(self):
+        client_id, client_secret = load_credentials()
+        if not client_id or not client_secret:
+            print("[CREDENTIALS] No valid credentials found!")
+            self.refresh_failures += 1
+            raise TokenRefreshError("ProKerala credentials not configured")
+
+        print("[TOKEN] Requesting new access token...")
+        try:
+            response = await upstream.post(TOKEN_URL, data={
+                'grant_type': 'client_credentials',
+                'client_id': client_id,
+                'client_secret': client_secret
+            })
+            response.raise_for_status()
+            token_response = response.json()
+        except Exception as e:
+            self.refresh_failures += 1
+            print(f"[ERROR] Failed to get access token: {str(e)}")
+            raise TokenRefreshError(f"Failed to get ProKerala access token: {str(e)}")
+
+        now = time.time()
+        expires_in = token_response.get('expires_in', 3600)
+        self.access_token = token_response['access_token']
+        self.fetched_at = now
+        self.expires_at = now + expires_in
+        self.refresh_count += 1
+        print(f"[TOKEN] Access token obtained successfully, expires in {expires_in}s")
+        return self.access_token
+
+    def start(self):
+        """Start proactive background renewal"""
+        if self._renew_task is None:
+            self._renew_task = asyncio.create_task(self._renew_loop())
+
+    async def stop(self):
+        if self._renew_task is not None:
+            self._renew_task.cancel()
+            try:
+                await self._renew_task
+            except asyncio.CancelledError:
+                pass
+            self._renew_task = None
+
+    async def _renew_loop(self):
+        while True:
+            try:
+                await self.refresh()
+                self.background_refreshes += 1
+                lifetime = self.expires_at - self.fetched_at
+                # Short-lived tokens renew at half-life instead of RENEW_AHEAD
+                delay = max(lifetime - min(RENEW_AHEAD, lifetime / 2), RETRY_DELAY)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[TOKEN] Background renewal failed, retrying in {RETRY_DELAY}s: {str(e)}")
+                delay = RETRY_DELAY
+            await asyncio.sleep(delay)
+
+    def stats(self):
+        now = time.time()
+        has_token = self.access_token is not None
+        return {
+            "has_token": has_token,
+            "token_age_seconds": round(now - self.fetched_at, 1) if has_token else None,
+            "expires_in_seconds": round(self.expires_at - now, 1) if has_token else None,
+            "refresh_count": self.refresh_count,
+            "refresh_failures": self.refresh_failures,
+            "background_refreshes": self.background_refreshes,
+            "coalesced_waits": self.coalesced_waits,
+        }
+
+
+token_manager = TokenManager()
@@ -9,6 +9,16 @@ import urllib.parse
 import os
 from datetime import datetime
 
+try:
+    from transits import transit_service
+except ImportError:
+    transit_service = None
+
+try:
+    import timezones
+except ImportError:
+    timezones = None
+
 class AstroAIHandler(BaseHTTPRequestHandler):
     def do_GET(self):
         if self.path == '/health':
@@ -161,7 +171,8 @@ class AstroAIHandler(BaseHTTPRequestHandler):
                 params = {
                     'ayanamsa': 1,  # Lahiri ayanamsa
                     'coordinates': f"{lat},{lon}",
-                    'datetime': f"{dob}T{tob}:00+00:00"
+                    'datetime': (timezones.localize(dob, tob, timezones.timezone_for(float(lat), float(lon)))
+                                 if timezones else f"{dob}T{tob}:00+00:00")
                 }
                 
                 print(f"[API] Calling ProKerala API with params: {params}")
@@ -339,11 +350,9 @@ class AstroAIHandler(BaseHTTPRequestHandler):
                 print(f"[DEBUG] Processed {len(planet_positions)} planets")
                 print(f"[DEBUG] Sun: {processed['sun_sign']}, Moon: {processed['moon_sign']}, Rising: {processed['rising_sign']}")
             
-            # Generate mock transits (ProKerala might not provide this)
-            processed['todays_transits'] = [
-                "Moon: Entering Sagittarius",
-                "Mercury: Direct in Capricorn"
-            ]
+            # Today's sky against the natal chart (needs numpy for the ephemeris)
+            if transit_service is not None:
+                processed['todays_transits'] = transit_service.transits_for(processed['planet_positions'])
             
             return processed
             
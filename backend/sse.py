@@ -0,0 +1,40 @@
+"""
+Server-Sent Events helpers.
+
+Resources taken before a stream opens (an LLM scheduler ticket, a credit
+reservation) cannot be released only from the event generator: if the client
+goes away before the server starts iterating it, the generator never runs
+and its `finally` never executes. EventStreamResponse runs an `on_close`
+callback however the response ends.
+"""
+
+import json
+
+from fastapi.responses import StreamingResponse
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class EventStreamResponse(StreamingResponse):
+    """text/event-stream response that always awaits on_close() when it ends"""
+
+    def __init__(self, content, on_close=None, headers=None):
+        super().__init__(
+            content,
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **(headers or {})}
+        )
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # Close the generator too, so its own cleanup runs if it had started
+            aclose = getattr(self.body_iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            if self.on_close is not None:
+                await self.on_close()
@@ -0,0 +1,35 @@
+import pytest
+
+from answer_cache import AnswerCache, normalize_question
+
+DIFFERENT_QUESTIONS = [
+    ("Who will I marry?", "Will I marry?"),
+    ("Should I change my job?", "Can I change my job?"),
+    ("When will I get married?", "Will I get married?"),
+    ("How will my career grow?", "Will my career grow?"),
+    ("Will my career grow?", "Will her career grow?"),
+    ("Should I move from Delhi to Mumbai?", "Should I move to Delhi from Mumbai?"),
+]
+
+
+@pytest.mark.parametrize('drop_stop_words', [False, True])
+@pytest.mark.parametrize('first, second', DIFFERENT_QUESTIONS)
+def test_different_questions_do_not_share_a_key(first, second, drop_stop_words):
+    assert normalize_question(first, drop_stop_words) != normalize_question(second, drop_stop_words)
+
+
+@pytest.mark.parametrize('first, second', DIFFERENT_QUESTIONS)
+def test_different_questions_do_not_share_an_answer(first, second):
+    cache = AnswerCache()
+    cache.set('chart', first, {'shortAnswer': first})
+    assert cache.get('chart', second) is None
+
+
+def test_rephrasings_share_a_key():
+    assert normalize_question("Will I get married this year?") == normalize_question("  will i GET married, this year ")
+    assert normalize_question("Please tell me about the career", True) == normalize_question("tell me about career", True)
+
+
+def test_stop_words_are_opt_in():
+    assert normalize_question("What is the best time?") == "what is the best time"
+    assert AnswerCache().drop_stop_words is False
@@ -0,0 +1,209 @@
+import asyncio
+import importlib
+import sys
+import types
+from functools import wraps
+
+import pytest
+
+
+class Increment:
+    def __init__(self, value):
+        self.value = value
+
+
+def async_transactional(fn):
+    """Retry fn until its transaction commits, like firestore.async_transactional"""
+    @wraps(fn)
+    async def run(transaction, *args, **kwargs):
+        while True:
+            transaction.begin()
+            result = await fn(transaction, *args, **kwargs)
+            await asyncio.sleep(0)
+            if transaction.commit():
+                return result
+    return run
+
+
+class Snapshot:
+    def __init__(self, data):
+        self.exists = data is not None
+        self._data = dict(data) if data is not None else None
+
+    def to_dict(self):
+        return self._data
+
+
+class Store:
+    """In-memory documents by path, with a version per path for conflict detection"""
+
+    def __init__(self):
+        self.docs = {}
+        self.versions = {}
+
+    def write(self, path, fields, merge=True):
+        data = dict(self.docs.get(path, {})) if merge else {}
+        for name, value in fields.items():
+            data[name] = data.get(name, 0) + value.value if isinstance(value, Increment) else value
+        self.docs[path] = data
+        self.versions[path] = self.versions.get(path, 0) + 1
+
+
+class DocumentRef:
+    def __init__(self, store, path):
+        self.store = store
+        self.path = path
+
+    def collection(self, name):
+        return CollectionRef(self.store, f"{self.path}/{name}")
+
+    async def get(self, transaction=None):
+        # Yield so concurrent transactions interleave between read and write
+        await asyncio.sleep(0)
+        if transaction is not None:
+            transaction.reads[self.path] = self.store.versions.get(self.path, 0)
+        return Snapshot(self.store.docs.get(self.path))
+
+    async def update(self, fields):
+        await asyncio.sleep(0)
+        self.store.write(self.path, fields)
+
+
+class CollectionRef:
+    def __init__(self, store, path):
+        self.store = store
+        self.path = path
+
+    def document(self, doc_id):
+        return DocumentRef(self.store, f"{self.path}/{doc_id}")
+
+    async def stream(self):
+        prefix = self.path + '/'
+        for path, data in list(self.store.docs.items()):
+            if path.startswith(prefix) and '/' not in path[len(prefix):]:
+                yield Snapshot(data)
+
+
+class Transaction:
+    def __init__(self, store):
+        self.store = store
+        self.conflicts = 0
+
+    def begin(self):
+        self.reads = {}
+        self.writes = []
+
+    def update(self, ref, fields):
+        self.writes.append((ref.path, fields, True))
+
+    def set(self, ref, data):
+        self.writes.append((ref.path, data, False))
+
+    def commit(self):
+        if any(self.store.versions.get(path, 0) != version for path, version in self.reads.items()):
+            self.conflicts += 1
+            return False
+        for path, fields, merge in self.writes:
+            self.store.write(path, fields, merge)
+        return True
+
+
+class Client:
+    def __init__(self):
+        self.store = Store()
+        self.transactions = []
+
+    def collection(self, name):
+        return CollectionRef(self.store, name)
+
+    def transaction(self):
+        transaction = Transaction(self.store)
+        self.transactions.append(transaction)
+        return transaction
+
+
+@pytest.fixture
+def credits(monkeypatch):
+    """The credits module imported against the fake firestore above"""
+    firestore = types.ModuleType('firebase_admin.firestore')
+    firestore.Increment = Increment
+    firestore.async_transactional = async_transactional
+    firebase_admin = types.ModuleType('firebase_admin')
+    firebase_admin.firestore = firestore
+    monkeypatch.setitem(sys.modules, 'firebase_admin', firebase_admin)
+    monkeypatch.setitem(sys.modules, 'firebase_admin.firestore', firestore)
+    monkeypatch.delitem(sys.modules, 'credits', raising=False)
+    return importlib.import_module('credits')
+
+
+def _user(uid, credits, credit_shards=0):
+    return types.SimpleNamespace(uid=uid, credits=credits, credit_shards=credit_shards)
+
+
+def _credits(db, path):
+    return db.store.docs.get(path, {}).get('credits', 0)
+
+
+@pytest.mark.parametrize('shards', [0, 4])
+def test_concurrent_reserves_never_overdraw(credits, shards):
+    db = Client()
+    ledger = credits.CreditLedger(db)
+    db.store.write('users/u1', {'credits': 3})
+
+    async def run():
+        if shards:
+            await ledger.shard_user('u1', shards)
+        user = _user('u1', 3, shards)
+        return await asyncio.gather(*(ledger.reserve(user) for _ in range(10)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    granted = [r for r in results if isinstance(r, credits.Reservation)]
+    assert len(granted) == 3
+    assert all(isinstance(r, credits.InsufficientCredits) for r in results if r not in granted)
+    balances = [data.get('credits', 0) for data in db.store.docs.values()]
+    assert min(balances) == 0 and sum(balances) == 0
+    assert ledger.stats()['reserved'] == 3 and ledger.stats()['rejected'] == 7
+    if not shards:
+        # Every reserve read the same document; without the conflict check all ten would pass
+        assert sum(t.conflicts for t in db.transactions) > 0
+
+
+def test_refund_after_commit_is_a_no_op(credits):
+    db = Client()
+    ledger = credits.CreditLedger(db)
+    db.store.write('users/u1', {'credits': 5})
+
+    async def run():
+        committed = await ledger.reserve(_user('u1', 5))
+        await ledger.commit(committed)
+        await ledger.refund(committed)
+        refunded = await ledger.reserve(_user('u1', 4))
+        await ledger.refund(refunded)
+        await ledger.refund(refunded)
+
+    asyncio.run(run())
+    assert _credits(db, 'users/u1') == 4
+    assert ledger.stats() == {"reserved": 2, "committed": 1, "refunded": 1, "rejected": 0}
+
+
+def test_empty_shards_fall_back_to_the_user_document(credits):
+    db = Client()
+    ledger = credits.CreditLedger(db)
+    db.store.write('users/u1', {'credits': 0})
+
+    async def run():
+        await ledger.shard_user('u1', 4)
+        # A purchase after sharding lands on the user document
+        await db.collection('users').document('u1').update({'credits': Increment(2)})
+        user = _user('u1', await ledger.balance('u1', db.store.docs['users/u1']), 4)
+        assert user.credits == 2
+        reservations = [await ledger.reserve(user), await ledger.reserve(user)]
+        with pytest.raises(credits.InsufficientCredits):
+            await ledger.reserve(user)
+        return reservations
+
+    reservations = asyncio.run(run())
+    assert [r.ref.path for r in reservations] == ['users/u1', 'users/u1']
+    assert all(r.sharded for r in reservations)
+    assert _credits(db, 'users/u1') == 0
+    assert all(_credits(db, f'users/u1/credit_shards/{i}') == 0 for i in range(4))
@@ -0,0 +1,50 @@
+from datetime import datetime
+
+import dasha
+
+BIRTH = datetime(2000, 1, 1)
+
+
+def _dates(periods):
+    return [(p['lord'], p['start'][:10], p['end'][:10]) for p in periods]
+
+
+def test_mahadasha_sequence_from_a_part_crossed_nakshatra():
+    # Moon at 15° Vrishabha, 3/8 of the way through Rohini: 6.25 of the Moon's 10 years remain
+    timeline = dasha.DashaTimeline(45.0, BIRTH)
+    assert timeline.first_lord == 'Moon'
+    assert abs(timeline.balance_years - 6.25) < 1e-9
+    assert _dates(timeline.periods(depth=1)) == [
+        ('Moon', '1996-04-01', '2006-04-01'),
+        ('Mars', '2006-04-01', '2013-04-01'),
+        ('Rahu', '2013-04-01', '2031-04-02'),
+        ('Jupiter', '2031-04-02', '2047-04-02'),
+        ('Saturn', '2047-04-02', '2066-04-01'),
+        ('Mercury', '2066-04-01', '2083-04-02'),
+        ('Ketu', '2083-04-02', '2090-04-01'),
+        ('Venus', '2090-04-01', '2110-04-02'),
+        ('Sun', '2110-04-02', '2116-04-02'),
+    ]
+
+
+def test_antardashas_split_in_proportion_to_years():
+    mars = dasha.DashaTimeline(45.0, BIRTH).periods(depth=2)[1]
+    # Mars/Mars is 7 * 7 / 120 years (149 days), Mars/Rahu 7 * 18 / 120 years
+    assert _dates(mars['periods'])[:3] == [
+        ('Mars', '2006-04-01', '2006-08-28'),
+        ('Rahu', '2006-08-28', '2007-09-16'),
+        ('Jupiter', '2007-09-16', '2008-08-22'),
+    ]
+    assert mars['periods'][-1]['lord'] == 'Moon'
+    assert mars['periods'][-1]['end'] == mars['end']
+
+
+def test_current_chain_at_birth_and_at_a_nakshatra_start():
+    timeline = dasha.DashaTimeline(45.0, BIRTH)
+    # Moon/Jupiter runs 1999-03 to 2000-07; its Venus sub-period 1999-10-28 to 2000-01-17
+    assert [p['lord'] for p in timeline.current(BIRTH)] == ['Moon', 'Jupiter', 'Venus']
+    # Moon at 0° Ashwini: the whole 7 years of Ketu from birth
+    ketu = dasha.DashaTimeline(0.0, BIRTH)
+    assert ketu.balance_years == 7
+    # 7 years of 365.25 days end at 18:00 on the last day of 2006
+    assert ketu.periods(depth=1)[0]['end'] == '2006-12-31T18:00:00'
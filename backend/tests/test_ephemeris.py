@@ -0,0 +1,68 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+import ephemeris
+import ephemeris_table
+
+# Tropical reference longitudes: the Moon at J2000.0 (Meeus, Astronomical
+# Algorithms) and the great conjunction of 2020-12-21 18:20 UTC at 0°29' Aquarius
+J2000_MOON = 223.32
+GREAT_CONJUNCTION = datetime(2020, 12, 21, 18, 20, tzinfo=timezone.utc)
+GREAT_CONJUNCTION_LONGITUDE = 300.48
+
+
+def _separation(a, b):
+    return np.abs(np.mod(np.asarray(a) - b + 180.0, 360.0) - 180.0)
+
+
+def _planet(longitudes, name):
+    return longitudes[ephemeris.PLANETS.index(name)]
+
+
+def test_moon_at_j2000():
+    tropical = _planet(ephemeris.tropical_longitudes(ephemeris.J2000), 'Moon')
+    sidereal = _planet(ephemeris.compute_sidereal_longitudes(ephemeris.J2000), 'Moon')
+    assert _separation(tropical, J2000_MOON) < 0.1
+    assert _separation(sidereal, J2000_MOON - ephemeris.lahiri_ayanamsa(ephemeris.J2000)) < 0.1
+    assert ephemeris.rasi(sidereal)['name'] == ephemeris.RASI_NAMES[6]
+
+
+def test_great_conjunction_of_2020():
+    jd = ephemeris.julian_day(GREAT_CONJUNCTION)
+    tropical = ephemeris.tropical_longitudes(jd)
+    jupiter, saturn = _planet(tropical, 'Jupiter'), _planet(tropical, 'Saturn')
+    assert _separation(jupiter, saturn) < 0.2
+    # Mean Keplerian elements, so a few tenths of a degree off the published position
+    assert _separation(jupiter, GREAT_CONJUNCTION_LONGITUDE) < 0.5
+    assert _separation(saturn, GREAT_CONJUNCTION_LONGITUDE) < 0.5
+
+
+def test_table_matches_analytic_ephemeris(tmp_path, monkeypatch):
+    # One year of daily rows is enough to exercise the interpolation
+    path = str(tmp_path / 'ephemeris.bin')
+    ephemeris_table.build(path, start_jd=2458849.5, end_jd=2459215.5)
+    table = ephemeris_table.EphemerisTable(path)
+    jd = np.random.default_rng(0).uniform(table.start_jd, table.end_jd, 2000)
+
+    longitudes, speeds = table.lookup(jd)
+    assert _separation(longitudes, ephemeris.compute_sidereal_longitudes(jd)).max() * 3600 < 5.0
+    assert np.abs(speeds - ephemeris.compute_daily_speeds(jd)).max() < 0.05
+
+    monkeypatch.setattr(ephemeris, '_table', table)
+    assert np.array_equal(ephemeris.sidereal_longitudes(jd), longitudes)
+    outside = table.end_jd + 10
+    assert not table.covers(outside)
+    assert np.array_equal(ephemeris.sidereal_longitudes(outside), ephemeris.compute_sidereal_longitudes(outside))
+
+
+@pytest.mark.parametrize('longitude, rasi, nakshatra, pada', [
+    (0.0, 'Mesha', 'Ashwini', 1),
+    (199.46, 'Tula', 'Swati', 4),
+    (359.99, 'Meena', 'Revati', 4),
+])
+def test_rasi_and_nakshatra(longitude, rasi, nakshatra, pada):
+    assert ephemeris.rasi(longitude)['name'] == rasi
+    assert ephemeris.nakshatra(longitude)['name'] == nakshatra
+    assert ephemeris.nakshatra(longitude)['pada'] == pada
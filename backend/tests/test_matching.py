@@ -0,0 +1,27 @@
+import pytest
+
+import matching
+
+
+@pytest.mark.parametrize('groom, bride, kootas, total', [
+    # Ashwini and Bharani, both in Mesha: only the Horse/Elephant yoni costs points
+    (('Mesha', 'Ashwini'), ('Mesha', 'Bharani'),
+     {'varna': 1, 'vashya': 2, 'tara': 3, 'yoni': 2, 'graha_maitri': 5, 'gana': 6, 'bhakoot': 7, 'nadi': 8}, 34),
+    # The same nakshatra shares its nadi: nadi dosha
+    (('Mesha', 'Ashwini'), ('Mesha', 'Ashwini'),
+     {'varna': 1, 'vashya': 2, 'tara': 3, 'yoni': 4, 'graha_maitri': 5, 'gana': 6, 'bhakoot': 7, 'nadi': 0}, 28),
+    # Magha (Simha) and Shravana (Makara): 6/8 bhakoot, Sun/Saturn enmity, both Antya nadi
+    (('Simha', 'Magha'), ('Makara', 'Shravana'),
+     {'varna': 1, 'vashya': 0.5, 'tara': 1.5, 'yoni': 2, 'graha_maitri': 0, 'gana': 1, 'bhakoot': 0, 'nadi': 0}, 6),
+])
+def test_known_couples(groom, bride, kootas, total):
+    query = {'moon_rasi': groom[0], 'moon_nakshatra': groom[1]}
+    candidate = {'id': 'bride', 'moon_rasi': bride[0], 'moon_nakshatra': bride[1]}
+    match = matching.rank_matches(query, [candidate])['matches'][0]
+    assert match['kootas'] == kootas
+    assert match['total'] == total
+    assert match['nadi_dosha'] == (kootas['nadi'] == 0)
+    assert match['bhakoot_dosha'] == (kootas['bhakoot'] == 0)
+    # The same couple scored from the bride's chart
+    reverse = matching.rank_matches(candidate, [query], query_role='bride')['matches'][0]
+    assert reverse['total'] == total
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+import muhurat
+
+# Mercury turns retrograde on 2024-04-01
+START = datetime(2024, 3, 30, tzinfo=timezone.utc)
+
+
+def brute_force(start, end, lat, lon, min_duration_minutes, **conditions):
+    """[begin, end) minute offsets of every passing run, evaluating each minute"""
+    minutes = int((end - start).total_seconds() // 60)
+    jd = muhurat.julian_day(start) + np.arange(minutes + 1) * muhurat.MINUTE
+    ok = muhurat.Conditions(lat, lon, **conditions).evaluate(jd)
+    runs, begin = [], None
+    for minute, passing in enumerate(ok[:-1]):
+        if passing and begin is None:
+            begin = minute
+        elif not passing and begin is not None:
+            runs.append((begin, minute))
+            begin = None
+    if begin is not None:
+        runs.append((begin, minutes))
+    return sorted(run for run in runs if run[1] - run[0] >= min_duration_minutes)
+
+
+def searched(start, end, lat, lon, min_duration_minutes, **conditions):
+    windows = muhurat.search(start, end, lat, lon, min_duration_minutes=min_duration_minutes, limit=1000, **conditions)
+
+    def offset(value):
+        return round((datetime.fromisoformat(value) - start).total_seconds() / 60)
+
+    return sorted((offset(w['start']), offset(w['end'])) for w in windows)
+
+
+def assert_same_windows(found, expected):
+    # Edges are bisected to within a minute and rounded, brute force sees whole minutes
+    assert len(found) == len(expected), (found, expected)
+    for (begin, end), (expected_begin, expected_end) in zip(found, expected):
+        assert abs(begin - expected_begin) <= 1 and abs(end - expected_end) <= 1, (found, expected)
+
+
+@pytest.mark.parametrize('conditions, min_duration_minutes', [
+    ({'tithis': [4, 5, 6, 19, 20, 21], 'lagnas': ['Vrishabha', 'Simha', 'Vrischika'], 'exclude_retrograde': ()}, 30),
+    ({'nakshatras': ['Mula', 'Purva Ashadha', 'Uttara Ashadha', 'Shravana'], 'lagnas': ['Mithuna', 'Kanya'],
+      'exclude_retrograde': ()}, 45),
+    ({'lagnas': ['Mesha', 'Karka', 'Tula', 'Makara'], 'exclude_retrograde': ('Mercury',)}, 5),
+])
+def test_windows_match_a_minute_by_minute_scan(conditions, min_duration_minutes):
+    end = START + timedelta(days=5)
+    assert_same_windows(
+        searched(START, end, 28.61, 77.21, min_duration_minutes, **conditions),
+        brute_force(START, end, 28.61, 77.21, min_duration_minutes, **conditions),
+    )
+
+
+@pytest.mark.parametrize('offset_minutes', range(15))
+def test_failing_stretch_shorter_than_the_grid_step_splits_windows(offset_minutes):
+    # At 64°N Meena rises in about 13 minutes, less than the 15-minute grid step
+    start = START + timedelta(minutes=offset_minutes)
+    end = start + timedelta(days=2)
+    conditions = {'lagnas': [name for name in muhurat.RASI_NAMES if name != 'Meena'], 'exclude_retrograde': ()}
+    expected = brute_force(start, end, 64.0, 25.0, 30, **conditions)
+    assert len(expected) == 3
+    assert_same_windows(searched(start, end, 64.0, 25.0, 30, **conditions), expected)
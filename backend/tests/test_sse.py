@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from llm_scheduler import LLMScheduler
+from sse import EventStreamResponse, sse_event
+
+SCOPE = {"type": "http", "asgi": {"spec_version": "2.3"}, "method": "POST", "path": "/ask/stream", "headers": []}
+
+
+def _abandoned_stream(scheduler, started):
+    """An /ask/stream-style response whose ticket was granted before the body started"""
+    ticket = scheduler.submit()
+
+    async def events():
+        started.append(True)
+        async with ticket:
+            yield sse_event("token", {"text": "{"})
+
+    async def release():
+        ticket.cancel()
+
+    return EventStreamResponse(events(), on_close=release)
+
+
+async def _disconnected(message=None):
+    return {"type": "http.disconnect"}
+
+
+async def _send_fails(message):
+    raise OSError("client went away")
+
+
+@pytest.mark.parametrize("receive, send", [
+    # The client is gone before the first byte, and Starlette stops listening at once
+    (_disconnected, lambda message: asyncio.sleep(0)),
+    # Writing the response start fails, so the body iterator never runs
+    (_disconnected, _send_fails),
+])
+def test_dropped_stream_releases_its_scheduler_slot(receive, send):
+    async def run():
+        scheduler = LLMScheduler(max_concurrency=2, deadline=0.5)
+        started = []
+        for _ in range(2):
+            response = _abandoned_stream(scheduler, started)
+            try:
+                await response(SCOPE, receive, send)
+            except OSError:
+                pass
+        assert scheduler.stats()["running"] == 0
+        assert scheduler.stats()["queued"] == 0
+
+        # Later questions still get a slot instead of timing out
+        async with scheduler.submit() as ticket:
+            assert ticket.remaining() > 0
+
+    asyncio.run(run())
+
+
+def test_completed_stream_sends_events_and_releases():
+    async def run():
+        scheduler = LLMScheduler(max_concurrency=1)
+        started, sent = [], []
+        response = _abandoned_stream(scheduler, started)
+
+        async def receive():
+            await asyncio.sleep(10)
+
+        async def send(message):
+            sent.append(message)
+
+        await response(SCOPE, receive, send)
+        assert started
+        assert b"event: token" in b"".join(m.get("body", b"") for m in sent)
+        assert sent[0]["headers"] and (b"content-type", b"text/event-stream; charset=utf-8") in sent[0]["headers"]
+        assert scheduler.stats()["running"] == 0
+
+    asyncio.run(run())
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pytest
+
+import timezones
+
+ZONES = ['America/New_York', 'Europe/London', 'Australia/Sydney', 'America/Sao_Paulo',
+         'Asia/Kolkata', 'America/Denver', 'Pacific/Chatham']
+
+
+@pytest.mark.parametrize('zone', ZONES)
+@pytest.mark.parametrize('year', [1943, 2021])
+def test_weekly_sampling_matches_zoneinfo_hourly_over_a_year(zone, year):
+    table = timezones.zone_table(zone)
+    info = ZoneInfo(zone)
+    start = datetime(year, 1, 1, tzinfo=timezone.utc)
+    for hour in range(0, 366 * 24):
+        instant = start + timedelta(hours=hour)
+        expected = int(instant.astimezone(info).utcoffset().total_seconds())
+        assert table.offset_at_utc(int(instant.timestamp())) == expected, instant
+
+
+@pytest.mark.parametrize('zone', ZONES)
+def test_local_offsets_match_zoneinfo(zone):
+    table = timezones.zone_table(zone)
+    info = ZoneInfo(zone)
+    start = datetime(2021, 1, 1)
+    # Every local half hour of the year; gaps and folds resolve to the later offset
+    local = [start + timedelta(minutes=30 * i) for i in range(365 * 48)]
+    local_ts = np.array([timezones.local_seconds(d.strftime('%Y-%m-%d'), d.strftime('%H:%M')) for d in local])
+    expected = [int(d.replace(tzinfo=info, fold=1).utcoffset().total_seconds()) for d in local]
+    vectorized = table.offsets_for_local(local_ts)
+    for d, ts, offset, batch in zip(local, local_ts, expected, vectorized):
+        # Skipped wall times have no real offset; only compare times that exist
+        if d.replace(tzinfo=info).astimezone(timezone.utc).astimezone(info).replace(tzinfo=None) != d:
+            continue
+        assert table.offset_for_local(int(ts)) == offset == batch, d
+
+
+def test_coordinates_near_a_known_place_get_its_zone():
+    assert timezones.timezone_for(28.70, 77.10) == 'Asia/Kolkata'
+
+
+@pytest.mark.parametrize('lat, lon, zone', [
+    (26.91, 70.91, 'Asia/Kolkata'),     # Jaisalmer: over 200 km from Jodhpur, but India has one zone
+    (19.72, -155.08, 'Pacific/Honolulu'),  # Hilo: only Honolulu within the region radius
+])
+def test_remote_coordinates_get_an_unambiguous_zone(lat, lon, zone):
+    assert timezones.nearest_zone(lat, lon)[2] > timezones.MAX_DISTANCE_KM
+    assert timezones.timezone_for(lat, lon) == zone
+
+
+def test_coordinates_between_zones_are_refused():
+    # El Paso: the nearest bundled place is in Arizona, which has no DST
+    with pytest.raises(ValueError, match='please provide a timezone'):
+        timezones.timezone_for(31.76, -106.49)
+    assert timezones.timezone_for(31.76, -106.49, max_distance_km=1000) == timezones.nearest_zone(31.76, -106.49)[0]
+
+
+def test_local_mean_time_offsets_are_rounded_to_the_minute():
+    assert timezones.format_offset(19800) == '+05:30'
+    assert timezones.format_offset(19270) == '+05:21'  # Madras LMT, +05:21:10
+    assert timezones.format_offset(-17762) == '-04:56'  # New York LMT, -04:56:02
+    assert timezones.localize('1880-01-01', '12:00', 'Asia/Kolkata')[-6:].count(':') == 1
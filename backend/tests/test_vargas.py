@@ -0,0 +1,33 @@
+import pytest
+
+import vargas
+from ephemeris import RASI_NAMES
+
+# (longitude, D9, D30, D60), worked out by hand from the Parashari rules
+GOLDEN = [
+    (0.5, 'Mesha', 'Mesha', 'Vrishabha'),
+    (15.0, 'Simha', 'Dhanu', 'Tula'),         # Mesha 15°: 5th navamsa, Jupiter's trimsamsa
+    (45.0, 'Vrishabha', 'Meena', 'Vrischika'),  # Vrishabha 15°: vargottama in D9
+    (100.0, 'Tula', 'Kanya', 'Meena'),        # Karka 10°
+    (275.5, 'Kumbha', 'Kanya', 'Dhanu'),      # Makara 5.5°
+]
+
+
+@pytest.mark.parametrize('longitude, d9, d30, d60', GOLDEN)
+def test_navamsa_trimsamsa_and_shashtiamsa_signs(longitude, d9, d30, d60):
+    signs, _ = vargas.varga_positions([longitude], [9, 30, 60])
+    assert [RASI_NAMES[int(s)] for s in signs[:, 0]] == [d9, d30, d60]
+
+
+def test_all_planets_at_once_match_one_at_a_time():
+    longitudes = [g[0] for g in GOLDEN]
+    signs, degrees = vargas.varga_positions(longitudes, [60, 9])
+    assert [RASI_NAMES[int(s)] for s in signs[1]] == [g[1] for g in GOLDEN]
+    assert [RASI_NAMES[int(s)] for s in signs[0]] == [g[3] for g in GOLDEN]
+    # Karka 10° is the start of its 4th navamsa
+    assert degrees[1, 3] == pytest.approx(0.0)
+
+
+def test_unsupported_division_is_refused():
+    with pytest.raises(ValueError, match='Unsupported divisions'):
+        vargas.varga_positions([10.0], [5])
@@ -0,0 +1,205 @@
+"""
+Historical UTC offsets for birth times.
+
+Each IANA zone's offset history over 1900-2100 is extracted once from the
+system tz database (zoneinfo) into two sorted arrays: transition instants and
+the offset in force from each one. After that, resolving a local birth time is
+a binary search on a memory-resident list, and the batch path resolves whole
+arrays of births per zone with a single searchsorted.
+
+The zone for a birth place comes from the gazetteer (the resolved place of
+birth, or the nearest known place to the coordinates). Coordinates with no
+known place within TIMEZONE_MAX_DISTANCE_KM still get a zone when it is
+unambiguous: every place within TIMEZONE_REGION_RADIUS_KM, or every place in
+the nearest place's country, uses the same one. Only coordinates left between
+zones (rural Arizona vs New Mexico, say) are refused; resolving those needs
+zone boundary polygons.
+"""
+
+import bisect
+import os
+import threading
+from datetime import datetime, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+
+from geocoder import gazetteer
+
+TABLE_START = datetime(1900, 1, 1, tzinfo=timezone.utc)
+TABLE_END = datetime(2100, 1, 1, tzinfo=timezone.utc)
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+# Sampling step for finding transitions; no zone in the tz database has two
+# transitions within a week of each other over 1900-2100
+SAMPLE_STEP = 7 * 86400
+DEFAULT_TIMEZONE = os.getenv('DEFAULT_TIMEZONE', 'UTC')
+# Zones whose tables are built at startup rather than on first use
+PRELOAD_TIMEZONES = [z for z in os.getenv('TIMEZONE_PRELOAD', 'Asia/Kolkata').split(',') if z]
+# Farthest a gazetteer place may be from the coordinates to lend them its zone
+MAX_DISTANCE_KM = float(os.getenv('TIMEZONE_MAX_DISTANCE_KM', 100))
+# Farther out, the zone is still used if every place within this radius shares it
+REGION_RADIUS_KM = float(os.getenv('TIMEZONE_REGION_RADIUS_KM', 500))
+
+
+def _offset_seconds(zone, ts):
+    return int(datetime.fromtimestamp(ts, zone).utcoffset().total_seconds())
+
+
+class ZoneTable:
+    """Offset history of one zone: offsets[i] applies from transitions[i] (UTC seconds)"""
+
+    def __init__(self, name):
+        zone = ZoneInfo(name)
+        start = int((TABLE_START - EPOCH).total_seconds())
+        end = int((TABLE_END - EPOCH).total_seconds())
+
+        transitions, offsets = [start], [_offset_seconds(zone, start)]
+        # Weekly samples, then bisect each change down to the second
+        previous_ts, previous = start, offsets[0]
+        for ts in range(start + SAMPLE_STEP, end, SAMPLE_STEP):
+            offset = _offset_seconds(zone, ts)
+            if offset != previous:
+                lo, hi = previous_ts, ts
+                while hi - lo > 1:
+                    mid = (lo + hi) // 2
+                    if _offset_seconds(zone, mid) == previous:
+                        lo = mid
+                    else:
+                        hi = mid
+                transitions.append(hi)
+                offsets.append(offset)
+            previous_ts, previous = ts, offset
+
+        self.name = name
+        self.transitions = transitions
+        self.offsets = offsets
+        self._transitions = np.array(transitions, dtype=np.int64)
+        self._offsets = np.array(offsets, dtype=np.int64)
+
+    def offset_at_utc(self, ts):
+        """Offset (seconds) in force at a UTC instant"""
+        return self.offsets[max(bisect.bisect_right(self.transitions, ts) - 1, 0)]
+
+    def offset_for_local(self, local_ts):
+        """
+        Offset of a local wall time given as seconds since 1970-01-01T00:00 local.
+
+        Wall times that are repeated or skipped around a transition both resolve
+        to the offset in force after it.
+        """
+        guess = self.offset_at_utc(local_ts - self.offsets[0])
+        offset = self.offset_at_utc(local_ts - guess)
+        if offset != guess:
+            offset = self.offset_at_utc(local_ts - offset)
+        return offset
+
+    def offsets_for_local(self, local_ts):
+        """Vectorized offset_for_local over an int64 array"""
+        def at(ts):
+            return self._offsets[np.maximum(np.searchsorted(self._transitions, ts, side='right') - 1, 0)]
+
+        guess = at(local_ts - self._offsets[0])
+        offset = at(local_ts - guess)
+        return np.where(offset != guess, at(local_ts - offset), offset)
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def zone_table(name):
+    """Memoized ZoneTable; raises ValueError for unknown zones"""
+    table = _tables.get(name)
+    if table is None:
+        with _tables_lock:
+            table = _tables.get(name)
+            if table is None:
+                try:
+                    table = ZoneTable(name)
+                except (ZoneInfoNotFoundError, ValueError) as e:
+                    raise ValueError(f"Unknown timezone: {name}") from e
+                _tables[name] = table
+                print(f"[TIMEZONE] Built {name} offset table ({len(table.transitions)} transitions)")
+    return table
+
+
+def preload(names=PRELOAD_TIMEZONES):
+    """Build the tables of commonly used zones ahead of the first request"""
+    for name in names:
+        try:
+            zone_table(name)
+        except ValueError as e:
+            print(f"[TIMEZONE] {str(e)}")
+
+
+@lru_cache(maxsize=65536)
+def nearest_zone(lat, lon):
+    """(zone, place label, distance_km) of the nearest gazetteer place, or None"""
+    place = gazetteer.nearest(lat, lon)
+    if place is None:
+        return None
+    return place['timezone'], place['label'], place['distance_km']
+
+
+@lru_cache(maxsize=65536)
+def regional_zone(lat, lon):
+    """The only zone of the places around a coordinate or of the nearest place's country, or None"""
+    zones = gazetteer.zones_within(lat, lon, REGION_RADIUS_KM)
+    if len(zones) == 1:
+        return zones.pop()
+    country = gazetteer.nearest(lat, lon)['country_code']
+    zones = gazetteer.country_zones.get(country, set())
+    return next(iter(zones)) if len(zones) == 1 else None
+
+
+def timezone_for(lat, lon, max_distance_km=None):
+    """
+    IANA zone for coordinates: the nearest gazetteer place's when it is within
+    max_distance_km (TIMEZONE_MAX_DISTANCE_KM by default), else regional_zone().
+
+    Raises ValueError when neither settles it, since zones and DST rules change
+    across borders; DEFAULT_TIMEZONE is used only if the gazetteer is empty.
+    """
+    nearest = nearest_zone(lat, lon)
+    if nearest is None:
+        return DEFAULT_TIMEZONE
+    zone, label, distance_km = nearest
+    limit = MAX_DISTANCE_KM if max_distance_km is None else max_distance_km
+    if distance_km <= limit:
+        return zone
+    regional = regional_zone(lat, lon)
+    if regional is not None:
+        return regional
+    print(f"[TIMEZONE] Unclear zone for {lat},{lon} (nearest: {label}, {distance_km} km)")
+    raise ValueError(
+        f"Cannot tell the timezone of {lat},{lon} (nearest known place is {label}, {distance_km} km away); "
+        f"please provide a timezone"
+    )
+
+
+def local_seconds(dob, tob):
+    """Wall-clock 'YYYY-MM-DD', 'HH:MM' as seconds since 1970-01-01T00:00 of the same clock"""
+    local = datetime.strptime(f"{dob}T{tob}", "%Y-%m-%dT%H:%M").replace(tzinfo=timezone.utc)
+    return int((local - EPOCH).total_seconds())
+
+
+def format_offset(seconds):
+    """ISO 8601 offset: 19800 -> '+05:30'; old local mean times are rounded to the minute"""
+    sign = '-' if seconds < 0 else '+'
+    hours, minutes = divmod((abs(seconds) + 30) // 60, 60)
+    return f"{sign}{hours:02d}:{minutes:02d}"
+
+
+def localize(dob, tob, zone_name):
+    """ISO datetime with the historical offset, e.g. '1990-05-01T10:30:00+05:30'"""
+    offset = zone_table(zone_name).offset_for_local(local_seconds(dob, tob))
+    return f"{dob}T{tob}:00{format_offset(offset)}"
+
+
+def stats():
+    return {
+        "zones_loaded": len(_tables),
+        "coordinate_lookups": nearest_zone.cache_info()._asdict(),
+        "regional_lookups": regional_zone.cache_info()._asdict(),
+    }
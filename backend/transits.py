@@ -0,0 +1,142 @@
+"""
+Current-sky transit service.
+
+The sky is computed once per time bucket (5 minutes by default) and shared by
+every request in that bucket. Each user's transits are then a cheap diff of
+that snapshot against their natal planet_positions: sign ingresses, retrograde
+stations, planets crossing the natal Moon/Sun/Ascendant signs, and the natal
+house each transiting planet occupies.
+"""
+
+import os
+import time
+
+import numpy as np
+
+from ephemeris import PLANETS, RASI_NAMES, sidereal_longitudes, daily_speeds
+
+BUCKET_SECONDS = int(os.getenv('TRANSIT_BUCKET_SECONDS', 300))
+
+# How far back (days) an ingress still counts as "entering", roughly 1/10 of
+# each planet's typical time in a sign
+INGRESS_WINDOWS = {
+    'Sun': 3, 'Moon': 0.25, 'Mercury': 2, 'Venus': 3, 'Mars': 5,
+    'Jupiter': 30, 'Saturn': 60, 'Rahu': 45, 'Ketu': 45
+}
+# A change of direction within +/- this many days counts as a station
+STATION_WINDOWS = {'Mercury': 1, 'Venus': 2, 'Mars': 3, 'Jupiter': 5, 'Saturn': 7}
+# Slow planets worth reporting when they sit on a natal Moon/Sun/Ascendant sign
+SLOW_PLANETS = ('Jupiter', 'Saturn', 'Rahu', 'Ketu')
+
+# Alternative spellings of rasi names used by ProKerala and others
+_RASI_ALIASES = {'Thula': 'Tula', 'Karkata': 'Karka', 'Vrishchika': 'Vrischika', 'Meenam': 'Meena'}
+_RASI_INDEX = {name: i for i, name in enumerate(RASI_NAMES)}
+
+
+def _unix_to_jd(timestamp):
+    return timestamp / 86400.0 + 2440587.5
+
+
+def _rasi_index(entry):
+    """Rasi index of a natal planet_positions entry, or None"""
+    longitude = entry.get('longitude')
+    if longitude is not None:
+        return int(longitude // 30) % 12
+    name = entry.get('sign')
+    return _RASI_INDEX.get(_RASI_ALIASES.get(name, name))
+
+
+class TransitService:
+    def __init__(self, bucket_seconds=BUCKET_SECONDS):
+        self.bucket_seconds = bucket_seconds
+        self._bucket = None
+        self._snapshot = None
+        self.snapshots_computed = 0
+
+    def snapshot(self, now=None):
+        """The shared sky for the current time bucket"""
+        now = time.time() if now is None else now
+        bucket = int(now // self.bucket_seconds)
+        if bucket != self._bucket:
+            self._snapshot = self._compute(bucket * self.bucket_seconds)
+            self._bucket = bucket
+            self.snapshots_computed += 1
+        return self._snapshot
+
+    def _compute(self, timestamp):
+        jd = _unix_to_jd(timestamp)
+        # Evaluate every offset we need for all planets in one vectorized pass
+        offsets = sorted({0.0} | {-w for w in INGRESS_WINDOWS.values()}
+                         | {s * w for w in STATION_WINDOWS.values() for s in (-1, 1)})
+        column = {offset: i for i, offset in enumerate(offsets)}
+        jds = jd + np.array(offsets)
+        longitudes = sidereal_longitudes(jds)
+        speeds = daily_speeds(jds)
+
+        now = column[0.0]
+        planets = []
+        for p, name in enumerate(PLANETS):
+            rasi = int(longitudes[p, now] // 30)
+            ingress = INGRESS_WINDOWS[name]
+            station = None
+            if name in STATION_WINDOWS:
+                window = STATION_WINDOWS[name]
+                before, after = speeds[p, column[-window]], speeds[p, column[window]]
+                if before > 0 > after:
+                    station = 'retrograde'
+                elif before < 0 < after:
+                    station = 'direct'
+            planets.append({
+                "name": name,
+                "rasi": rasi,
+                "degree": float(longitudes[p, now] % 30),
+                "retrograde": name in ('Rahu', 'Ketu') or bool(speeds[p, now] < 0),
+                "ingress": int(longitudes[p, column[-ingress]] // 30) != rasi,
+                "station": station,
+            })
+        return {"timestamp": timestamp, "jd": jd, "planets": planets}
+
+    def transits_for(self, planet_positions, now=None):
+        """Human-readable transits for one chart's natal planet_positions"""
+        sky = self.snapshot(now)
+        natal = {entry.get('planet'): _rasi_index(entry) for entry in planet_positions or []}
+        asc_rasi = natal.get('Ascendant')
+
+        def house(rasi):
+            return f" (House {(rasi - asc_rasi) % 12 + 1})" if asc_rasi is not None else ""
+
+        ingresses, stations, contacts = [], [], []
+        moon = None
+        for planet in sky['planets']:
+            name, rasi = planet['name'], planet['rasi']
+            sign = RASI_NAMES[rasi]
+            if planet['ingress']:
+                ingresses.append(f"{name}: Entering {sign}{house(rasi)}")
+            if planet['station'] == 'retrograde':
+                stations.append(f"{name}: Stationing retrograde in {sign}{house(rasi)}")
+            elif planet['station'] == 'direct':
+                stations.append(f"{name}: Stationing direct in {sign}{house(rasi)}")
+            elif planet['retrograde'] and name in STATION_WINDOWS:
+                stations.append(f"{name}: Retrograde in {sign}{house(rasi)}")
+            if name in SLOW_PLANETS:
+                for point in ('Moon', 'Sun', 'Ascendant'):
+                    if natal.get(point) == rasi:
+                        label = 'Lagna' if point == 'Ascendant' else f"{point} sign"
+                        contacts.append(f"{name}: Transiting your natal {label} {sign}")
+            if name == 'Moon' and not planet['ingress']:
+                moon = f"Moon: In {sign}{house(rasi)}"
+
+        transits = ingresses + stations + contacts
+        if moon:
+            transits.append(moon)
+        return transits
+
+    def stats(self):
+        return {
+            "bucket_seconds": self.bucket_seconds,
+            "snapshots_computed": self.snapshots_computed,
+            "current_bucket_start": self._snapshot['timestamp'] if self._snapshot else None,
+        }
+
+
+transit_service = TransitService()
@@ -0,0 +1,66 @@
+"""
+Shared HTTP client for upstream APIs (ProKerala).
+
+One pooled, keep-alive async client is created when the app starts and closed
+when it shuts down, so kundli requests reuse warm TCP+TLS connections and never
+block the event loop while waiting on the network.
+"""
+
+import os
+
+import httpx
+
+# Total sockets the pool may open, and how many idle ones it keeps alive
+MAX_CONNECTIONS = int(os.getenv('UPSTREAM_MAX_CONNECTIONS', 128))
+MAX_KEEPALIVE = int(os.getenv('UPSTREAM_MAX_KEEPALIVE', 32))
+KEEPALIVE_EXPIRY = float(os.getenv('UPSTREAM_KEEPALIVE_EXPIRY', 30))
+# Seconds to wait for a free pooled connection before failing the request
+POOL_TIMEOUT = float(os.getenv('UPSTREAM_POOL_TIMEOUT', 10))
+CONNECT_TIMEOUT = float(os.getenv('UPSTREAM_CONNECT_TIMEOUT', 5))
+READ_TIMEOUT = float(os.getenv('UPSTREAM_READ_TIMEOUT', 20))
+
+_client = None
+
+
+def start():
+    """Create the shared upstream client"""
+    global _client
+    if _client is not None:
+        return _client
+
+    _client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            READ_TIMEOUT,
+            connect=CONNECT_TIMEOUT,
+            pool=POOL_TIMEOUT,
+        ),
+    )
+    print(f"[UPSTREAM] Client started (max={MAX_CONNECTIONS}, keepalive={MAX_KEEPALIVE})")
+    return _client
+
+
+async def close():
+    """Close the shared upstream client and its pooled connections"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        print("[UPSTREAM] Client closed")
+
+
+def get_client():
+    """Return the shared client, starting it lazily if needed"""
+    return _client or start()
+
+
+async def get(url, **kwargs):
+    return await get_client().get(url, **kwargs)
+
+
+async def post(url, **kwargs):
+    return await get_client().post(url, **kwargs)
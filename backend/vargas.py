@@ -0,0 +1,140 @@
+"""
+Divisional charts (vargas) computed from natal longitudes.
+
+Every supported varga except the Trimsamsa splits each sign into D equal parts
+and maps part k of sign r to sign start[r] + step[r] * k. Those start/step
+rules are tabulated per division at import, so all requested divisions for all
+planets are placed with one indexing pass; the Trimsamsa's unequal parts are
+handled with a boundary search.
+"""
+
+import numpy as np
+
+from ephemeris import RASI_NAMES
+
+VARGA_NAMES = {
+    1: 'Rasi', 2: 'Hora', 3: 'Drekkana', 4: 'Chaturthamsa', 7: 'Saptamsa',
+    9: 'Navamsa', 10: 'Dasamsa', 12: 'Dwadasamsa', 16: 'Shodasamsa', 20: 'Vimsamsa',
+    24: 'Chaturvimsamsa', 27: 'Bhamsa', 30: 'Trimsamsa', 40: 'Khavedamsa',
+    45: 'Akshavedamsa', 60: 'Shashtiamsa'
+}
+
+PLANET_SYMBOLS = {
+    'Sun': 'S', 'Moon': 'M', 'Mercury': 'Me', 'Venus': 'V',
+    'Mars': 'Ma', 'Jupiter': 'J', 'Saturn': 'Sa',
+    'Rahu': 'R', 'Ketu': 'K', 'Ascendant': 'As'
+}
+
+
+def _rule(division, r):
+    """(start sign, step) of the first part of sign r; r even is an odd sign"""
+    odd = r % 2 == 0
+    modality = r % 3  # movable, fixed, dual
+    element = r % 4   # fire, earth, air, water
+    rules = {
+        1: (r, 0),
+        2: (4, -1) if odd else (3, 1),  # Sun's and Moon's horas
+        3: (r, 4),
+        4: (r, 3),
+        7: (r if odd else r + 6, 1),
+        9: (r * 9, 1),
+        10: (r if odd else r + 8, 1),
+        12: (r, 1),
+        16: ((0, 4, 8)[modality], 1),
+        20: ((0, 8, 4)[modality], 1),
+        24: (4 if odd else 3, 1),
+        27: ((0, 3, 6, 9)[element], 1),
+        30: (0, 0),  # unequal parts, see _trimsamsa
+        40: (0 if odd else 6, 1),
+        45: ((0, 4, 8)[modality], 1),
+        60: (r, 1),
+    }
+    start, step = rules[division]
+    return start % 12, step
+
+
+_DIVISIONS = sorted(VARGA_NAMES)
+_ROW = {division: i for i, division in enumerate(_DIVISIONS)}
+_START = np.array([[_rule(d, r)[0] for r in range(12)] for d in _DIVISIONS])
+_STEP = np.array([[_rule(d, r)[1] for r in range(12)] for d in _DIVISIONS])
+
+# Trimsamsa degree boundaries and the signs of Mars, Saturn, Jupiter, Mercury
+# and Venus they map to (reversed for even signs)
+_TRIMSAMSA_BOUNDS = np.array([[0, 5, 10, 18, 25, 30], [0, 5, 12, 20, 25, 30]], dtype=float)
+_TRIMSAMSA_SIGNS = np.array([[0, 10, 8, 2, 6], [1, 5, 11, 9, 7]])
+
+
+def _trimsamsa(rasi, degree):
+    """Signs and in-part degrees for the Trimsamsa"""
+    parity = rasi % 2
+    part = np.empty(rasi.shape, dtype=int)
+    for p in (0, 1):
+        mask = parity == p
+        part[mask] = np.searchsorted(_TRIMSAMSA_BOUNDS[p], degree[mask], side='right') - 1
+    part = np.clip(part, 0, 4)
+    lower = _TRIMSAMSA_BOUNDS[parity, part]
+    upper = _TRIMSAMSA_BOUNDS[parity, part + 1]
+    return _TRIMSAMSA_SIGNS[parity, part], (degree - lower) / (upper - lower) * 30.0
+
+
+def varga_positions(longitudes, divisions):
+    """
+    Signs (K, P) and degrees within sign (K, P) for K divisions and P longitudes
+    """
+    unsupported = [d for d in divisions if d not in VARGA_NAMES]
+    if unsupported:
+        raise ValueError(f"Unsupported divisions: {unsupported}; supported are {_DIVISIONS}")
+
+    longitudes = np.mod(np.asarray(longitudes, dtype=float), 360.0)
+    rasi = (longitudes // 30).astype(int)
+    degree = longitudes - rasi * 30
+    d = np.array(divisions)[:, np.newaxis]
+    rows = np.array([_ROW[division] for division in divisions])[:, np.newaxis]
+
+    part = np.minimum((degree * d // 30).astype(int), d - 1)
+    signs = (_START[rows, rasi] + _STEP[rows, rasi] * part) % 12
+    degrees = np.mod(degree * d, 30.0)
+
+    if 30 in divisions:
+        k = list(divisions).index(30)
+        signs[k], degrees[k] = _trimsamsa(rasi, degree)
+    return signs, degrees
+
+
+def divisional_charts(planet_positions, divisions):
+    """Requested vargas in the rasi_chart houses/planets structure, keyed 'D9' etc."""
+    divisions = sorted(set(divisions))
+    entries = [entry for entry in planet_positions or [] if entry.get('longitude') is not None]
+    if not divisions or not entries:
+        return {}
+
+    signs, degrees = varga_positions([entry['longitude'] for entry in entries], divisions)
+    ascendant = next((i for i, entry in enumerate(entries) if entry['planet'] == 'Ascendant'), None)
+
+    charts = {}
+    for k, division in enumerate(divisions):
+        # Houses count from the varga lagna, or from Mesha if it is unknown
+        lagna = int(signs[k, ascendant]) if ascendant is not None else 0
+        houses = [{"number": i + 1, "sign": RASI_NAMES[(lagna + i) % 12], "planets": []} for i in range(12)]
+        planets = []
+        for p, entry in enumerate(entries):
+            sign = int(signs[k, p])
+            house = (sign - lagna) % 12 + 1
+            symbol = PLANET_SYMBOLS.get(entry['planet'], entry['planet'])
+            houses[house - 1]["planets"].append(symbol)
+            planets.append({
+                "symbol": symbol,
+                "name": entry['planet'],
+                "house": house,
+                "sign": RASI_NAMES[sign],
+                "degree": round(float(degrees[k, p]), 4),
+                "longitude": round(sign * 30 + float(degrees[k, p]), 4),
+                "retrograde": entry.get('retrograde', False)
+            })
+        charts[f"D{division}"] = {
+            "division": division,
+            "name": VARGA_NAMES[division],
+            "houses": houses,
+            "planets": planets
+        }
+    return charts
@@ -2,7 +2,7 @@
 import React, { createContext, useContext, useEffect, useState } from "react";
 import { auth, signInWithGooglePopup, signOutFirebase, db } from "../lib/firebase";
 import { onAuthStateChanged, User as FirebaseUser } from "firebase/auth";
-import { doc, setDoc, serverTimestamp, getDoc } from "firebase/firestore";
+import { doc, setDoc, serverTimestamp, getDoc, collection, getDocs } from "firebase/firestore";
 
 type User = {
   uid: string;
@@ -66,13 +66,22 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
         } else {
           // User exists, get their data
           const userData = snap.data();
+          // High-volume accounts keep most of their credits in sharded counters
+          // (backend/credits.py); the user document holds the rest
+          let credits = userData.credits ?? 5;
+          if (userData.credit_shards) {
+            const shards = await getDocs(collection(db, "users", fbUser.uid, "credit_shards"));
+            shards.forEach((shard) => {
+              credits += shard.data().credits || 0;
+            });
+          }
           setUser({
             uid: fbUser.uid,
             email: fbUser.email,
             displayName: fbUser.displayName,
             photoURL: fbUser.photoURL,
             role: userData.role || 'end_user',
-            credits: userData.credits || 5,
+            credits,
             referralCode: userData.referralCode || generateReferralCode(fbUser.uid)
           });
         }